@@ -0,0 +1,161 @@
+"""
+CSC111 Project 2: Nxt Movie
+
+Module Description
+==================
+Approximate nearest neighbour search for building the NeighbourIndex of large catalogues, where comparing every pair
+of movies takes too long.
+
+ClusterBackend is an inverted file index: the dense embeddings of the movies are clustered with k-means, and every
+movie is filed under its nearest cluster. Each movie is then only compared, using the exact TF-IDF cosine similarity,
+against the movies filed under the few clusters nearest to it.
+
+Copyright and Usage Information
+===============================
+
+The file is expressly provided for the purposes of course assessments for CSC111 at the University of Toronto.
+All forms of distribution of this code, whether as given or with any changes, are expressly prohibited.
+
+© 2024 Umair Arham, Abdallah Arham Wajid Mohammed, Sameer Shahed, All Rights Reserved
+"""
+
+from __future__ import annotations
+from typing import Optional
+import numpy as np
+from scipy import sparse
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.preprocessing import normalize
+import embeddings
+import recommender
+
+
+class ClusterBackend(recommender.SimilarityBackend):
+    """
+    A SimilarityBackend finding approximate neighbours by clustering the TruncatedSVD embeddings of the movies, and
+    comparing every movie only against the movies of its probes nearest clusters.
+
+    More probes find more of the true neighbours (higher recall) at the cost of comparing more movies. More clusters
+    make each cluster smaller, which is faster for the same number of probes but misses more neighbours. Movies with
+    fewer than k movies to compare against have their neighbours computed exactly.
+
+    Instance Attributes:
+        dimensions:
+            The number of dimensions of the embeddings that are clustered.
+        clusters:
+            The number of clusters, or None to use the square root of the number of movies.
+        probes:
+            The number of clusters nearest to a movie whose movies it is compared against.
+        seed:
+            The seed of the embeddings and of k-means, so the same catalogue always gets the same neighbours.
+    """
+
+    dimensions: int
+    clusters: Optional[int]
+    probes: int
+    seed: int
+
+    def __init__(self, dimensions: int = embeddings.DIMENSIONS, clusters: Optional[int] = None, probes: int = 8,
+                 seed: int = 0) -> None:
+        self.dimensions = dimensions
+        self.clusters = clusters
+        self.probes = probes
+        self.seed = seed
+
+    def top_k(self, matrix: sparse.csr_matrix, k: int,
+              chunk_size: Optional[int] = None) -> tuple[np.ndarray, np.ndarray]:
+        n = matrix.shape[0]
+        k = min(k, n)
+        normalized = normalize(sparse.csr_matrix(matrix, dtype=np.float32))
+        vectors = embeddings.svd_embeddings(matrix, self.dimensions, self.seed)
+        centroids = self.centroids(vectors)
+        probes = self.nearest_centroids(vectors, centroids, chunk_size)
+
+        # Sorting the movies by cluster, and the probes by the cluster probed, makes both of every cluster a
+        # contiguous range. A movie is filed under its nearest cluster, which is its first probe.
+        members = np.argsort(probes[:, 0], kind='stable')
+        member_bounds = np.searchsorted(probes[members, 0], np.arange(len(centroids) + 1))
+        probing = np.argsort(probes.ravel(), kind='stable')
+        probe_bounds = np.searchsorted(probes.ravel()[probing], np.arange(len(centroids) + 1))
+
+        neighbours = np.full((n, k), -1, dtype=np.int32)
+        scores = np.full((n, k), -np.inf, dtype=np.float32)
+
+        for cluster in range(len(centroids)):
+            cluster_members = members[member_bounds[cluster]:member_bounds[cluster + 1]]
+            queries = probing[probe_bounds[cluster]:probe_bounds[cluster + 1]] // probes.shape[1]
+
+            if len(cluster_members) == 0 or len(queries) == 0:
+                continue
+
+            transposed = normalized[cluster_members].T.tocsr()
+            step = recommender.chunk_rows(len(cluster_members), chunk_size)
+            for start in range(0, len(queries), step):
+                rows = queries[start:start + step]
+                _merge(neighbours, scores, rows, cluster_members, (normalized[rows] @ transposed).toarray())
+
+        short = np.flatnonzero(neighbours[:, -1] < 0)
+        if len(short) > 0:
+            neighbours[short], scores[short] = recommender.top_k_neighbours(matrix, k, chunk_size, rows=short)
+
+        return neighbours, scores
+
+    def centroids(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Return the L2-normalized centroids of the k-means clusters of the given embeddings.
+        """
+        clusters = self.clusters if self.clusters is not None else int(np.sqrt(len(vectors)))
+        kmeans = MiniBatchKMeans(n_clusters=max(1, min(clusters, len(vectors))), random_state=self.seed, n_init=3)
+
+        return embeddings.normalize_rows(kmeans.fit(vectors).cluster_centers_)
+
+    def nearest_centroids(self, vectors: np.ndarray, centroids: np.ndarray,
+                          chunk_size: Optional[int] = None) -> np.ndarray:
+        """
+        Return the (N, probes) array of the probes centroids most similar to every row of the given embeddings,
+        most similar first.
+        """
+        probes = min(self.probes, len(centroids))
+        nearest = np.empty((len(vectors), probes), dtype=np.int64)
+        chunk_size = recommender.chunk_rows(len(centroids), chunk_size)
+
+        for start in range(0, len(vectors), chunk_size):
+            similarity = vectors[start:start + chunk_size] @ centroids.T
+            top = np.argpartition(-similarity, probes - 1, axis=1)[:, :probes]
+            order = np.argsort(-np.take_along_axis(similarity, top, axis=1), axis=1, kind='stable')
+            nearest[start:start + chunk_size] = np.take_along_axis(top, order, axis=1)
+
+        return nearest
+
+
+def _merge(neighbours: np.ndarray, scores: np.ndarray, rows: np.ndarray, candidates: np.ndarray,
+           block: np.ndarray) -> None:
+    """
+    Update the neighbours and scores of the given rows with the given candidates, where block holds the similarity
+    of every row to every candidate. Each row keeps its k most similar movies, breaking ties by the lower movie as
+    recommender.top_k_neighbours does.
+    """
+    k = neighbours.shape[1]
+
+    if block.shape[1] > k:
+        top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        block = np.take_along_axis(block, top, axis=1)
+        candidates = candidates[top]
+    else:
+        candidates = np.broadcast_to(candidates, block.shape)
+
+    merged_neighbours = np.hstack([neighbours[rows], candidates])
+    merged_scores = np.hstack([scores[rows], block.astype(np.float32)])
+    order = np.lexsort((merged_neighbours, -merged_scores), axis=-1)[:, :k]
+
+    neighbours[rows] = np.take_along_axis(merged_neighbours, order, axis=1)
+    scores[rows] = np.take_along_axis(merged_scores, order, axis=1)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['__future__', 'typing', 'numpy', 'scipy', 'sklearn.cluster', 'sklearn.preprocessing',
+                          'embeddings', 'recommender'],
+        'max-line-length': 120
+    })
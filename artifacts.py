@@ -0,0 +1,354 @@
+"""
+CSC111 Project 2: Nxt Movie
+
+Module Description
+==================
+Builds the precomputed recommender data (TF-IDF vocabulary and matrix, neighbour index, movie table and the
+FilterTable of the most common filters) offline, and saves it to a versioned artifact directory. The app opens the
+saved arrays with memory mapping, so starting up does not recompute anything.
+
+Only the TF-IDF matrix, the neighbour index, the filter results and the numeric columns of the movie table stay
+memory mapped, so every worker process on a machine shares their pages. Text columns are decoded into Python strings
+when they are loaded, so each process keeps its own copy of them, as well as the MovieStore the Catalogue builds.
+
+To build the artifacts from the movies table, run: python artifacts.py build [artifact_dir]. With --incremental, the
+neighbour index of the current artifacts is updated for the movies that changed instead of being rebuilt, using the
+backend it was built with unless --probes or --dimensions picks another. An index built with --dimensions is always
+rebuilt, as its scores cannot be updated in place, and its artifacts hold the same TF-IDF matrix and neighbour arrays
+as any other: the embeddings only make the build cheaper. With --no-filter-table, the filter results are not
+precomputed.
+
+Copyright and Usage Information
+===============================
+
+The file is expressly provided for the purposes of course assessments for CSC111 at the University of Toronto.
+All forms of distribution of this code, whether as given or with any changes, are expressly prohibited.
+
+© 2024 Umair Arham, Abdallah Arham Wajid Mohammed, Sameer Shahed, All Rights Reserved
+"""
+
+from __future__ import annotations
+import datetime
+import decimal
+import json
+import os
+import shutil
+import time
+from typing import Any, Optional
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+import ann
+import embeddings
+import filter_table
+import recommender
+
+# The default directory the artifacts are written to and read from
+ARTIFACT_DIR = 'artifacts'
+
+# The version of the on-disk layout. Artifacts written with a different format are ignored.
+FORMAT = 1
+
+# The number of artifact versions kept on disk after a build, including the new one
+KEEP_VERSIONS = 2
+
+# The backends a saved neighbour index can have been built with, by the name saved in the manifest
+BACKENDS = {'ExactBackend': recommender.ExactBackend, 'ClusterBackend': ann.ClusterBackend,
+            'EmbeddingBackend': embeddings.EmbeddingBackend}
+
+
+class Artifacts:
+    """
+    The precomputed recommender data loaded from an artifact directory. The arrays of the index and the numeric
+    columns of df are memory mapped read-only, while the text columns of df are decoded copies private to this process.
+
+    Instance Attributes:
+        path:
+            The directory the artifacts were loaded from.
+        manifest:
+            The contents of the directory's manifest.json.
+        df:
+            A pandas dataframe of all the movies and their attributes.
+        index:
+            The NeighbourIndex of the movies, including its vectorizer and TF-IDF matrix.
+        filter_table:
+            The precomputed results of the most common filters, or None if they were not built.
+    """
+
+    path: str
+    manifest: dict[str, Any]
+    df: pd.DataFrame
+    index: recommender.NeighbourIndex
+    filter_table: Optional[filter_table.FilterTable]
+
+    def __init__(self, path: str, manifest: dict[str, Any], df: pd.DataFrame, index: recommender.NeighbourIndex,
+                 table: Optional[filter_table.FilterTable] = None) -> None:
+        self.path = path
+        self.manifest = manifest
+        self.df = df
+        self.index = index
+        self.filter_table = table
+
+    @property
+    def source_version(self) -> tuple:
+        """
+        The version of the movies table the artifacts were built from.
+        """
+        return tuple(self.manifest['source_version'])
+
+
+def build_artifacts(df: pd.DataFrame, source_version: tuple, root: str = ARTIFACT_DIR,
+                    k: int = recommender.DEFAULT_NEIGHBOURS, index: Optional[recommender.NeighbourIndex] = None,
+                    table: Optional[filter_table.FilterTable] = None) -> str:
+    """
+    Compute the recommender data for the movies in the given dataframe and save it to a new version directory under
+    root, then make it the current version. Return the path of the new version directory. If the NeighbourIndex of
+    the movies is given, it is saved instead of being computed. The FilterTable of the movies is only saved if given,
+    as it takes much longer to build.
+
+    The version directory is written under a temporary name and renamed once complete, so readers never see a
+    partially written version. If the build fails, the temporary directory is deleted.
+    """
+    os.makedirs(root, exist_ok=True)
+    name = _claim_version(root)
+    path = os.path.join(root, name)
+    tmp = path + '.tmp'
+
+    try:
+        index = index if index is not None else recommender.create_neighbour_index(df, k=k)
+        matrix = sparse.csr_matrix(index.matrix)
+
+        np.save(os.path.join(tmp, 'tfidf_data.npy'), matrix.data)
+        np.save(os.path.join(tmp, 'tfidf_indices.npy'), matrix.indices)
+        np.save(os.path.join(tmp, 'tfidf_indptr.npy'), matrix.indptr)
+        np.save(os.path.join(tmp, 'idf.npy'), index.vectorizer.idf_)
+        np.save(os.path.join(tmp, 'neighbours.npy'), index.neighbours)
+        np.save(os.path.join(tmp, 'scores.npy'), index.scores)
+
+        with open(os.path.join(tmp, 'vocabulary.json'), 'w', encoding='utf-8') as f:
+            json.dump({term: int(i) for term, i in index.vectorizer.vocabulary_.items()}, f)
+
+        columns = {column: _save_column(tmp, column, df[column]) for column in df.columns}
+
+        manifest = {'format': FORMAT, 'version': name, 'source_version': [_plain(v) for v in source_version],
+                    'created': time.time(), 'movies': len(df), 'neighbours': index.neighbours.shape[1],
+                    'tfidf_shape': list(matrix.shape), 'drift': index.drift, 'columns': columns}
+
+        if index.backend is not None:
+            manifest['backend'] = {'name': type(index.backend).__name__, 'options': vars(index.backend)}
+
+        if table is not None:
+            np.save(os.path.join(tmp, 'filter_results.npy'), table.results)
+            manifest['filter_table'] = {'keys': table.keys(),
+                                        'release_range': [_plain(v) for v in table.release_range]}
+
+        with open(os.path.join(tmp, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+
+        os.replace(tmp, path)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    _write_current(root, name)
+    prune_versions(root)
+
+    return path
+
+
+def load_artifacts(root: str = ARTIFACT_DIR) -> Optional[Artifacts]:
+    """
+    Open the current version of the artifacts under root with memory mapping, decoding the text columns of the movie
+    table. Return None if there are no usable artifacts.
+    """
+    try:
+        with open(os.path.join(root, 'CURRENT'), encoding='utf-8') as f:
+            path = os.path.join(root, f.read().strip())
+        with open(os.path.join(path, 'manifest.json'), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if manifest.get('format') != FORMAT:
+        return None
+
+    df = pd.DataFrame({column: _load_column(path, column, kind) for column, kind in manifest['columns'].items()})
+
+    matrix = sparse.csr_matrix((_load(path, 'tfidf_data'), _load(path, 'tfidf_indices'),
+                                _load(path, 'tfidf_indptr')), shape=tuple(manifest['tfidf_shape']), copy=False)
+
+    with open(os.path.join(path, 'vocabulary.json'), encoding='utf-8') as f:
+        vocabulary = json.load(f)
+
+    vectorizer = TfidfVectorizer()
+    vectorizer.vocabulary_ = vocabulary
+    vectorizer.idf_ = _load(path, 'idf')
+
+    backend = None
+    if manifest.get('backend', {}).get('name') in BACKENDS:
+        backend = BACKENDS[manifest['backend']['name']](**manifest['backend']['options'])
+
+    index = recommender.NeighbourIndex(df['title'].tolist(), _load(path, 'neighbours'), _load(path, 'scores'),
+                                       vectorizer, matrix, manifest.get('drift', 0.0), backend)
+
+    table = None
+    if 'filter_table' in manifest:
+        table = filter_table.FilterTable([tuple(key) for key in manifest['filter_table']['keys']],
+                                         _load(path, 'filter_results'), df['title'].tolist(),
+                                         tuple(manifest['filter_table']['release_range']))
+
+    return Artifacts(path, manifest, df, index, table)
+
+
+def prune_versions(root: str, keep: int = KEEP_VERSIONS) -> None:
+    """
+    Delete all but the newest keep version directories under root. The current version is never deleted.
+    """
+    with open(os.path.join(root, 'CURRENT'), encoding='utf-8') as f:
+        current = f.read().strip()
+
+    versions = sorted(d for d in os.listdir(root)
+                      if d.startswith('v') and not d.endswith('.tmp') and os.path.isdir(os.path.join(root, d)))
+
+    for name in versions[:-keep]:
+        if name != current:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def _claim_version(root: str) -> str:
+    """
+    Create the temporary directory of a new version under root, and return the name of the version. Names are the
+    current time to the microsecond, so they sort in the order the versions were created, followed by a counter if a
+    build running at the same time already took the name.
+    """
+    name = datetime.datetime.now().strftime('v%Y%m%dT%H%M%S%f')
+    candidate, i = name, 0
+
+    while True:
+        if not os.path.exists(os.path.join(root, candidate)):
+            try:
+                os.makedirs(os.path.join(root, candidate + '.tmp'))
+                return candidate
+            except FileExistsError:
+                pass
+
+        i += 1
+        candidate = f'{name}-{i:03d}'
+
+
+def _write_current(root: str, name: str) -> None:
+    """
+    Atomically point the CURRENT file under root at the version directory called name.
+    """
+    tmp = os.path.join(root, 'CURRENT.tmp')
+
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(name)
+
+    os.replace(tmp, os.path.join(root, 'CURRENT'))
+
+
+def _save_column(path: str, column: str, values: pd.Series) -> str:
+    """
+    Save a column of the movies table, and return whether it was saved as 'numeric' or 'text'.
+
+    Numeric columns are saved as a single array. Text columns are saved as the concatenation of their UTF-8 encoded
+    values, along with the offset at which each value starts and which values are missing.
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        np.save(os.path.join(path, f'col_{column}.npy'), values.to_numpy())
+        return 'numeric'
+
+    missing = values.isna().to_numpy()
+    encoded = [b'' if m else str(v).encode('utf-8') for v, m in zip(values, missing)]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+
+    np.save(os.path.join(path, f'col_{column}.npy'), np.frombuffer(b''.join(encoded), dtype=np.uint8))
+    np.save(os.path.join(path, f'col_{column}_offsets.npy'), offsets)
+    np.save(os.path.join(path, f'col_{column}_missing.npy'), missing)
+
+    return 'text'
+
+
+def _load_column(path: str, column: str, kind: str) -> np.ndarray:
+    """
+    Load a column of the movies table saved by _save_column as the given kind. Numeric columns are returned memory
+    mapped, but text columns are decoded into a new array of Python strings, which is not shared with other processes.
+    """
+    data = _load(path, f'col_{column}')
+
+    if kind == 'numeric':
+        return data
+
+    offsets = _load(path, f'col_{column}_offsets')
+    missing = _load(path, f'col_{column}_missing')
+    raw = data.tobytes()
+
+    return np.array([None if missing[i] else raw[offsets[i]:offsets[i + 1]].decode('utf-8')
+                     for i in range(len(missing))], dtype=object)
+
+
+def _load(path: str, name: str) -> np.ndarray:
+    """
+    Memory map the array saved as name.npy in the given directory.
+    """
+    return np.load(os.path.join(path, name + '.npy'), mmap_mode='r')
+
+
+def _plain(value: Any) -> Any:
+    """
+    Convert a value read from the database into one that can be written to json. Decimals, which pyodbc returns for
+    DECIMAL columns, are converted to floats, as catalogue.get_version does.
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+
+    return value
+
+
+if __name__ == '__main__':
+    import argparse
+    import catalogue
+    import repository
+
+    parser = argparse.ArgumentParser(description='Build the precomputed recommender artifacts.')
+    parser.add_argument('command', choices=['build'])
+    parser.add_argument('root', nargs='?', default=ARTIFACT_DIR)
+    parser.add_argument('--neighbours', type=int, default=recommender.DEFAULT_NEIGHBOURS)
+    parser.add_argument('--incremental', action='store_true')
+    parser.add_argument('--probes', type=int, help='find approximate neighbours with ann.ClusterBackend')
+    parser.add_argument('--dimensions', type=int, help='compare movies by embeddings of this many dimensions')
+    parser.add_argument('--no-filter-table', action='store_true', help='do not precompute the most common filters')
+    args = parser.parse_args()
+
+    with repository.connection() as conn:
+        version = catalogue.get_version(conn)
+        movies = pd.read_sql('SELECT * FROM movies', conn)
+    movies.drop(columns='id', inplace=True)
+
+    start = time.perf_counter()
+    dimensions = args.dimensions or embeddings.DIMENSIONS
+
+    if args.probes:
+        backend = ann.ClusterBackend(dimensions, probes=args.probes)
+    elif args.dimensions:
+        backend = embeddings.EmbeddingBackend(dimensions)
+    else:
+        backend = None
+
+    saved = load_artifacts(args.root) if args.incremental else None
+
+    if saved is not None:
+        built = recommender.update_neighbour_index(saved.index, saved.df, movies, args.neighbours, backend=backend)
+    else:
+        built = recommender.create_neighbour_index(movies, args.neighbours, backend=backend)
+
+    # The filter results depend on every matching movie, so the table is always rebuilt in full
+    filters = None if args.no_filter_table else filter_table.build_filter_table(movies)
+
+    print(f'Built {build_artifacts(movies, version, args.root, args.neighbours, built, filters)} '
+          f'in {time.perf_counter() - start:.1f}s')
@@ -0,0 +1,526 @@
+"""
+CSC111 Project 2: Nxt Movie
+
+Module Description
+==================
+Benchmarks comparing the optimized algorithms of the app against the implementations they replaced. Each benchmark
+prints a small table of its results.
+
+To run a benchmark, run: python benchmarks.py <name>, or python benchmarks.py --help to list them.
+
+Copyright and Usage Information
+===============================
+
+The file is expressly provided for the purposes of course assessments for CSC111 at the University of Toronto.
+All forms of distribution of this code, whether as given or with any changes, are expressly prohibited.
+
+© 2024 Umair Arham, Abdallah Arham Wajid Mohammed, Sameer Shahed, All Rights Reserved
+"""
+
+from __future__ import annotations
+import hashlib
+import random
+import threading
+import time
+import tracemalloc
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+import pandas as pd
+import artifacts
+import recommender
+import trees
+
+GENRES = ['Action', 'Adventure', 'Animation', 'Biography', 'Comedy', 'Crime', 'Documentary', 'Drama', 'Family',
+          'Fantasy', 'History', 'Horror', 'Music', 'Mystery', 'Romance', 'Sci-Fi', 'Sport', 'Thriller', 'War',
+          'Western']
+RATINGS = ['G', 'PG', 'PG-13', 'R', 'NC-17', 'TV-MA', 'Unrated']
+WORDS = ('a the young old man woman family city secret journey night world life death friend mystery killer school '
+         'father mother story town dark light house dream escape team power king queen island ocean space time war '
+         'love must find lost return home road between two brothers sisters after before during years new last '
+         'first final small great hidden truth revenge fight survive against forces').split()
+# The syllables of the made up words of the descriptions of generated movies
+SYLLABLES = 'ba be bi bo da de di do ka ke ki ko la le li lo ma me mi mo na ne ni no ra re ri ro sa se si so'.split()
+
+
+def catalogue_frame(n: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Return a dataframe of n movies laid out like the movies table. Movies are taken from the saved artifacts when
+    there are enough of them, and are randomly generated otherwise.
+    """
+    saved = artifacts.load_artifacts()
+    if saved is not None and len(saved.df) >= n:
+        return saved.df.sample(n=n, random_state=seed).reset_index(drop=True)
+
+    rng = random.Random(seed)
+    topics = description_topics(max(1, n // 50), rng)
+    rows = []
+
+    for i in range(n):
+        description = rng.choices(rng.choice(topics), k=rng.randint(10, 30)) + rng.choices(WORDS, k=rng.randint(5, 10))
+        rng.shuffle(description)
+        rows.append({'title': f'{" ".join(rng.sample(WORDS, rng.randint(1, 4))).title()} {i}',
+                     'image': f'https://example.com/{i}.jpg', 'release': rng.randint(1910, 2024),
+                     'rating': rng.choice(RATINGS), 'metacritic': float(rng.randint(10, 100)),
+                     'description': ' '.join(description),
+                     'audience': round(rng.uniform(0, 10), 1),
+                     'directors': ', '.join(f'Director {rng.randint(0, n // 5)}' for _ in range(rng.randint(1, 2))),
+                     'runtime': f'{rng.randint(1, 3)} h {rng.randint(0, 59)} m',
+                     'genres': ','.join(rng.sample(GENRES, rng.randint(1, 4)))})
+
+    return pd.DataFrame(rows)
+
+
+def description_topics(n: int, rng: random.Random, words: int = 60) -> list[list[str]]:
+    """
+    Return n topics, each a list of made up words that the descriptions of movies about the topic mostly use, so that
+    generated movies have neighbours that are clearly more similar to them than the rest of the catalogue.
+    """
+    vocabulary = list({''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(max(words, n * 20))})
+    vocabulary.sort()
+
+    return [rng.sample(vocabulary, words) for _ in range(n)]
+
+
+def timed(function: Callable[[], Any], repeat: int = 3) -> tuple[float, Any]:
+    """
+    Call function repeat times, and return the shortest time taken in seconds along with the last result.
+    """
+    best, result = float('inf'), None
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+
+    return best, result
+
+
+def measured(function: Callable[[], Any]) -> tuple[float, float, Any]:
+    """
+    Call function once, and return the time taken in seconds and the peak memory allocated in MiB, along with its
+    result.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    try:
+        result = function()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return elapsed, peak / 2 ** 20, result
+
+
+def bench_pagerank(sizes: tuple[int, ...] = (100, 500, 1000, 2000)) -> None:
+    """
+    Compare recommender.pagerank against networkx.pagerank on complete graphs weighted by calculate_similarity, as
+    built by recommendation_engine_filters.
+    """
+    import networkx as nx
+
+    movies = trees.read_in_movies(catalogue_frame(max(sizes)))
+    print(f'{"movies":>8} {"networkx":>10} {"numpy":>10} {"speedup":>8} {"top 20 equal":>13} {"max diff":>10}')
+
+    for size in sizes:
+        weights = recommender.similarity_matrix(movies[:size])
+        nx_time, expected = timed(lambda: nx.pagerank(nx.from_numpy_array(weights)))
+        np_time, actual = timed(lambda: recommender.pagerank(weights))
+
+        expected = np.array([expected[i] for i in range(size)])
+        same = list(np.argsort(-expected, kind='stable')[:20]) == list(np.argsort(-actual, kind='stable')[:20])
+        print(f'{size:>8} {nx_time * 1000:>8.1f}ms {np_time * 1000:>8.1f}ms {nx_time / np_time:>7.1f}x '
+              f'{str(same):>13} {np.abs(expected - actual).max():>10.2e}')
+
+
+def bench_knn(sizes: tuple[int, ...] = (500, 2000, 5000), neighbours: tuple[int | None, ...] = (None, 10, 25, 50),
+              max_candidates: tuple[int | None, ...] = (None, 500, 1000)) -> None:
+    """
+    Compare recommendation_engine_filters over the complete graph of the filtered movies against the pruned
+    k-nearest neighbour graph, reporting the time taken and the overlap of their top 20.
+    """
+    movies = trees.read_in_movies(catalogue_frame(max(sizes)))
+    print(f'{"movies":>8} {"k":>4} {"cap":>6} {"exact":>10} {"pruned":>10} {"overlap":>8}')
+
+    for size in sizes:
+        candidates = movies[:size]
+        exact_time, exact = timed(lambda: recommender.recommendation_engine_filters(candidates), repeat=1)
+
+        for k in neighbours:
+            for cap in max_candidates:
+                if k is None and cap is None:
+                    continue
+
+                pruned_time, pruned = timed(lambda: recommender.recommendation_engine_filters(candidates, k, cap),
+                                            repeat=1)
+                overlap = len(set(exact) & set(pruned)) / len(exact)
+                print(f'{size:>8} {str(k):>4} {str(cap):>6} {exact_time * 1000:>8.1f}ms {pruned_time * 1000:>8.1f}ms '
+                      f'{overlap:>8.2f}')
+
+
+def bench_search(size: int = 100000, queries: int = 200, seed: int = 0) -> None:
+    """
+    Compare title_search.TitleSearch against scoring every title, as trees.search used to, on size titles. Queries
+    are parts of random titles with a typo. Reports latency percentiles, and how many of the 25 results score at
+    least as well as the 25th best title overall. Many titles often tie for the 25th best score, so this measures
+    the quality of the results better than comparing them to one particular top 25.
+    """
+    from fuzzywuzzy import fuzz, process
+    from title_search import TitleSearch, partial_ratios, preprocess
+
+    titles = sorted(catalogue_frame(size, seed)['title'])
+    rng = random.Random(seed)
+    build_time, index = timed(lambda: TitleSearch(titles), repeat=1)
+    processed = [preprocess(title) for title in titles]
+
+    samples = []
+    for title in rng.sample(titles, queries):
+        words = title.split()
+        query = ' '.join(words[:rng.randint(1, len(words))])
+        typo = rng.randrange(len(query))
+        samples.append(query[:typo] + rng.choice('aeiourst') + query[typo + 1:])
+
+    indexed, scanned, completed, recalls = [], [], [], []
+    for query in samples:
+        indexed_time, result = timed(lambda: index.search(query), repeat=1)
+        scan_time, scores = timed(lambda: partial_ratios(preprocess(query), processed), repeat=1)
+        complete_time, _ = timed(lambda: index.complete(query[:4]), repeat=1)
+        indexed.append(indexed_time)
+        scanned.append(scan_time)
+        completed.append(complete_time)
+
+        threshold = np.sort(scores)[-25]
+        recalls.append(np.mean(partial_ratios(preprocess(query), [preprocess(t) for t in result]) >= threshold))
+
+    old_time, _ = timed(lambda: process.extract(samples[0], titles, scorer=fuzz.partial_ratio, limit=25), repeat=1)
+    print(f'{size} titles, index built in {build_time:.2f}s, {np.mean(recalls):.1%} of results as good as the '
+          f'best 25, fuzzywuzzy took {old_time:.2f}s for one query')
+    print(f'{"":>10} {"p50":>10} {"p99":>10}')
+    for name, times in [('full scan', scanned), ('n-gram', indexed), ('prefix', completed)]:
+        print(f'{name:>10} {np.percentile(times, 50) * 1000:>8.2f}ms {np.percentile(times, 99) * 1000:>8.2f}ms')
+
+
+def listing_page(page: int, cards: int = 24) -> str:
+    """
+    Return a randomly generated listing page laid out like the metacritic browse pages, with the given number of
+    movie cards surrounded by navigation markup.
+    """
+    rng = random.Random(page)
+    items = []
+
+    for i in range(cards):
+        rating = rng.choice(RATINGS + [''])
+        meta = f'<span>Mar {rng.randint(1, 28)}, {rng.randint(1910, 2024)}</span>'
+        meta += f'<span>•</span><span>{rating}</span>' if rating else ''
+        items.append(
+            f'<div class="c-finderProductCard"><a href="/movie/{page}-{i}/">'
+            f'<div class="c-finderProductCard_img"><picture class="c-cmsImage">'
+            f'<img src="https://example.com/{page}/{i}.jpg" class="c-cmsImage-loaded" alt=""></picture></div>'
+            f'<div class="c-finderProductCard_info"><div class="c-finderProductCard_title">'
+            f'<h3>{(page - 1) * cards + i + 1}. {" ".join(rng.sample(WORDS, 3)).title()}</h3></div>'
+            f'<div class="c-finderProductCard_meta">{meta}</div>'
+            f'<div class="c-finderProductCard_description">{" ".join(rng.choices(WORDS, k=30))}</div>'
+            f'<div class="c-finderProductCard_meta g-outer-spacing-top-auto"><div class="c-siteReviewScore">'
+            f'<span>{rng.randint(10, 100)}</span></div><span>Metascore</span></div></div></a></div>')
+
+    nav = '<ul class="c-nav">' + ''.join(f'<li><a href="/browse/{j}/">Link {j}</a></li>' for j in range(300)) + '</ul>'
+    return f'<html><head><title>Browse</title></head><body>{nav}<div>{"".join(items)}</div>{nav}</body></html>'
+
+
+def movie_page(movie: int) -> str:
+    """
+    Return a randomly generated movie page laid out like the metacritic movie pages, with the details read by
+    scraper.parse_details surrounded by navigation markup.
+    """
+    rng = random.Random(movie)
+    genres = ''.join(f'<li class="c-genreList_item"><a><span class="c-globalButton_label">{genre}</span></a></li>'
+                     for genre in rng.sample(GENRES, rng.randint(1, 4)))
+
+    nav = '<ul class="c-nav">' + ''.join(f'<li><a href="/movie/{j}/">Link {j}</a></li>' for j in range(300)) + '</ul>'
+    return (f'<html><head><title>Movie</title></head><body>{nav}<div class="c-heroMetadata"><ul>'
+            f'<li class="c-heroMetadata_item"><span>{rng.randint(1910, 2024)}</span></li>'
+            f'<li class="c-heroMetadata_item"><span>{rng.randint(1, 3)} h {rng.randint(0, 59)} m</span></li></ul>'
+            f'</div><div class="c-siteReviewScore_user"><span>{rng.randint(10, 99) / 10}</span></div>'
+            f'<div class="c-productDetails_staff"><div class="c-crewList g-inner-spacing-bottom-small '
+            f'c-productDetails_staff_directors">Directed By: Director {rng.randint(0, 999)}</div></div>'
+            f'<ul class="c-genreList">{genres}</ul>{nav}</body></html>')
+
+
+def saved_pages(pages_dir: str, generate: Callable[[int], str], pages: int) -> list[bytes]:
+    """
+    Return the html of the .html files saved in pages_dir, in order of their names, or of pages pages made by
+    generate if there are none.
+    """
+    import os
+
+    if os.path.isdir(pages_dir) and any(name.endswith('.html') for name in os.listdir(pages_dir)):
+        html = []
+        for name in sorted(os.listdir(pages_dir)):
+            if name.endswith('.html'):
+                with open(os.path.join(pages_dir, name), 'rb') as f:
+                    html.append(f.read())
+        return html
+
+    return [generate(page).encode('utf-8') for page in range(1, pages + 1)]
+
+
+def bench_parse(pages_dir: str = 'listing_pages', pages: int = 20) -> None:
+    """
+    Compare scraper.parse_listing against calling the per-field scraper functions for every row, as
+    scraper.scrape_data used to. Listing pages are read from the .html files saved in pages_dir if there are any, and
+    randomly generated otherwise.
+    """
+    from bs4 import BeautifulSoup
+    import scraper
+
+    html = saved_pages(pages_dir, listing_page, pages)
+
+    def per_field() -> list[list[dict[str, Any]]]:
+        results = []
+        for page in html:
+            soup = BeautifulSoup(page, 'html.parser')
+            rows = []
+            for i, title in enumerate(scraper.get_title(soup)):
+                rows.append({'title': title,
+                             'image': scraper.get_image(soup)[i] if i < len(scraper.get_image(soup)) else None,
+                             'release': scraper.rel_date(soup)[i] if i < len(scraper.rel_date(soup)) else None,
+                             'rating': scraper.get_rating(soup)[i] if i < len(scraper.get_rating(soup)) else None,
+                             'metacritic': scraper.get_score(soup)[i] if i < len(scraper.get_score(soup)) else None,
+                             'description': scraper.get_desc(soup)[i] if i < len(scraper.get_desc(soup)) else None})
+            results.append(rows)
+        return results
+
+    old_time, old = timed(per_field, repeat=1)
+    cards = sum(len(rows) for rows in old)
+    print(f'{len(html)} pages, {cards} cards')
+    print(f'{"parser":>12} {"strainer":>9} {"per page":>10} {"speedup":>8} {"titles equal":>13}')
+    print(f'{"per field":>12} {"":>9} {old_time / len(html) * 1000:>8.1f}ms {1:>7.1f}x {"":>13}')
+
+    parsers = ['html.parser'] + (['lxml'] if scraper.LISTING_PARSER == 'lxml' else [])
+    for parser in parsers:
+        for strain in (False, True):
+            new_time, new = timed(lambda: [scraper.parse_listing(page, parser, strain) for page in html])
+            same = [[r['title'] for r in rows] for rows in old] == [[r['title'] for r in rows] for rows in new]
+            print(f'{parser:>12} {str(strain):>9} {new_time / len(html) * 1000:>8.1f}ms '
+                  f'{old_time / new_time:>7.1f}x {str(same):>13}')
+
+
+def bench_parse_workers(pages_dir: str = 'listing_pages', movies_dir: str = 'movie_pages', pages: int = 100,
+                        workers: tuple[int, ...] = (1, 2, 4), chunk_sizes: tuple[int, ...] = (1, 4, 16)) -> None:
+    """
+    Compare the throughput of parsing listing pages and movie pages in the scraper's pipeline threads against
+    parsing them in a process pool with various numbers of workers and chunk sizes. Pages are read from the .html
+    files saved in pages_dir and movies_dir if there are any, and randomly generated otherwise. Pool times do not
+    include starting the processes.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    import pipeline
+    import scraper
+
+    listings = list(enumerate(saved_pages(pages_dir, listing_page, pages), start=1))
+    movies = saved_pages(movies_dir, movie_page, pages * 4)
+
+    serial_listings, expected_listings = timed(lambda: [scraper.parse_page(page) for page in listings], repeat=1)
+    serial_movies, expected_movies = timed(lambda: [scraper.parse_details(page) for page in movies], repeat=1)
+
+    print(f'{len(listings)} listing pages, {len(movies)} movie pages')
+    print(f'{"workers":>8} {"chunk":>6} {"listings/s":>11} {"movies/s":>9} {"same":>5}')
+    print(f'{"threads":>8} {"":>6} {len(listings) / serial_listings:>11.1f} {len(movies) / serial_movies:>9.1f}')
+
+    for worker in workers:
+        with ProcessPoolExecutor(worker) as executor:
+            list(executor.map(scraper.parse_details, movies[:worker]))
+
+            for chunk_size in chunk_sizes:
+                listing_time, parsed_listings = timed(
+                    lambda: list(pipeline.in_processes(scraper.parse_page, listings, executor, chunk_size)), repeat=1)
+                movie_time, parsed_movies = timed(
+                    lambda: list(executor.map(scraper.parse_details, movies, chunksize=chunk_size)), repeat=1)
+                same = parsed_listings == expected_listings and parsed_movies == expected_movies
+                print(f'{worker:>8} {chunk_size:>6} {len(listings) / listing_time:>11.1f} '
+                      f'{len(movies) / movie_time:>9.1f} {str(same):>5}')
+
+
+def bench_ann(sizes: tuple[int, ...] = (5000, 20000, 50000), k: int = recommender.DEFAULT_NEIGHBOURS,
+              probes: tuple[int, ...] = (1, 2, 4, 8, 16)) -> None:
+    """
+    Compare the neighbours found by ann.ClusterBackend with various numbers of probes against the
+    recommender.ExactBackend. Reports recall@k: the fraction of the k neighbours found that are at least as similar
+    as the k-th most similar movie, which does not penalize choosing between movies tied for the k-th place.
+    """
+    import ann
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    print(f'{"movies":>8} {"probes":>7} {"time":>9} {"speedup":>8} {"recall@" + str(k):>10}')
+
+    for size in sizes:
+        matrix = TfidfVectorizer().fit_transform(recommender.combined_text(catalogue_frame(size)))
+        exact_time, (_, exact) = timed(lambda: recommender.ExactBackend().top_k(matrix, k), repeat=1)
+        print(f'{size:>8} {"exact":>7} {exact_time:>8.2f}s {1:>7.1f}x {1:>10.3f}')
+
+        for probe in probes:
+            backend = ann.ClusterBackend(probes=probe)
+            approx_time, (_, approx) = timed(lambda: backend.top_k(matrix, k), repeat=1)
+            recall = np.mean(approx >= exact[:, -1:] - 1e-6)
+            print(f'{size:>8} {probe:>7} {approx_time:>8.2f}s {exact_time / approx_time:>7.1f}x {recall:>10.3f}')
+
+
+def bench_embeddings(sizes: tuple[int, ...] = (5000, 20000), dimensions: tuple[int, ...] = (64, 128, 256),
+                     k: int = recommender.DEFAULT_NEIGHBOURS) -> None:
+    """
+    Compare finding the neighbours of every movie from its embeddings.EmbeddingBackend embedding of various
+    dimensions against finding them from its raw TF-IDF vector with recommender.ExactBackend. Reports the memory
+    taken by the vectors while the neighbours are found (the embeddings are not kept afterwards, so the index and the
+    artifacts still hold the TF-IDF matrix), the time taken and peak memory allocated to find the neighbours
+    (including computing the embeddings), and overlap@k: the fraction of the k TF-IDF neighbours of a movie that are
+    also found from the embeddings.
+    """
+    import embeddings
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    print(f'{"movies":>8} {"vectors":>9} {"size":>10} {"peak":>10} {"time":>9} {"overlap@" + str(k):>11}')
+
+    for size in sizes:
+        matrix = TfidfVectorizer().fit_transform(recommender.combined_text(catalogue_frame(size)))
+        matrix_size = (matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes) / 2 ** 20
+        exact_time, exact_peak, (exact, _) = measured(lambda: recommender.ExactBackend().top_k(matrix, k))
+        print(f'{size:>8} {"tf-idf":>9} {matrix_size:>7.1f}MiB {exact_peak:>7.1f}MiB {exact_time:>8.2f}s '
+              f'{1:>11.3f}')
+
+        for dimension in dimensions:
+            vectors_size = size * min(dimension, matrix.shape[1] - 1) * np.dtype(np.float32).itemsize / 2 ** 20
+            backend = embeddings.EmbeddingBackend(dimension)
+            dense_time, dense_peak, (dense, _) = measured(lambda: backend.top_k(matrix, k))
+            overlap = np.mean([len(np.intersect1d(a, b)) for a, b in zip(exact, dense)]) / exact.shape[1]
+            print(f'{size:>8} {dimension:>9} {vectors_size:>7.1f}MiB {dense_peak:>7.1f}MiB {dense_time:>8.2f}s '
+                  f'{overlap:>11.3f}')
+
+
+class PageServer(ThreadingHTTPServer):
+    """
+    A local stand-in for the website scraped by scraper.py, serving the pages made by listing_page at
+    <url>/browse?page=<page> and those made by movie_page at <url>/movie/<name>/. Pages are served with an ETag, and
+    a conditional request for a page that has not changed is answered with 304 Not Modified.
+
+    Instance Attributes:
+        url:
+            The url of the server, without a trailing slash.
+        missing:
+            If positive, about one in this many movie pages is answered with 404 Not Found, always the same ones.
+        latency:
+            The number of seconds every request is delayed by.
+        requests:
+            The number of requests served so far.
+    """
+    url: str
+    missing: int
+    latency: float
+    requests: int
+
+    def __init__(self, missing: int = 0, latency: float = 0.0) -> None:
+        super().__init__(('127.0.0.1', 0), PageHandler)
+        self.url = f'http://127.0.0.1:{self.server_address[1]}'
+        self.missing = missing
+        self.latency = latency
+        self.requests = 0
+
+    def __enter__(self) -> PageServer:
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def page(self, path: str) -> str | None:
+        """
+        Return the html of the page at the given path, or None if there is no such page.
+        """
+        parts = urlsplit(path)
+
+        if parts.path.startswith('/movie/'):
+            movie = zlib.crc32(parts.path.encode('utf-8'))
+            return None if self.missing > 0 and movie % self.missing == 0 else movie_page(movie)
+
+        page = parse_qs(parts.query).get('page')
+        return listing_page(int(page[0])) if parts.path == '/browse' and page and page[0].isdigit() else None
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    """
+    Answers the requests sent to a PageServer.
+    """
+    protocol_version = 'HTTP/1.1'
+    server: PageServer
+
+    def do_GET(self) -> None:
+        """
+        Answer a GET request with the page at the requested path.
+        """
+        self.server.requests += 1
+        time.sleep(self.server.latency)
+        html = self.server.page(self.path)
+
+        if html is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = html.encode('utf-8')
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        not_modified = self.headers.get('If-None-Match') == etag
+
+        self.send_response(304 if not_modified else 200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', '0' if not_modified else str(len(body)))
+        self.end_headers()
+
+        if not not_modified:
+            self.wfile.write(body)
+
+    def log_message(self, *args: Any) -> None:
+        """
+        Do not log requests.
+        """
+
+
+def bench_scrape(pages: int = 10, missing: tuple[int, ...] = (0, 10), latency: float = 0.01) -> None:
+    """
+    Run scraper.scrape_data against a local PageServer serving pages pages of generated movies, each request delayed
+    by latency seconds, once for every setting of PageServer.missing. Reports the time taken, the number of rows
+    written and the number of written rows that are blank because their movie page could not be fetched, which
+    should be none.
+    """
+    import fetcher
+    import scraper
+
+    print(f'{"missing":>8} {"time":>9} {"pages/s":>8} {"requests":>9} {"written":>8} {"blank":>6}')
+
+    for every in missing:
+        with PageServer(every, latency) as server, fetcher.Fetcher(requests_per_second=0) as client:
+            rows = []
+            scrape_time, written = timed(
+                lambda: scraper.scrape_data('', f'{server.url}/browse?page=', 1, pages, client,
+                                            f'{server.url}/movie/', rows.extend, None), repeat=1)
+            blank = sum(1 for row in rows if not row['genres'] and not row['directors'])
+            print(f'{every:>8} {scrape_time:>8.2f}s {pages / scrape_time:>8.1f} {server.requests:>9} {written:>8} '
+                  f'{blank:>6}')
+
+
+BENCHMARKS = {'pagerank': bench_pagerank, 'knn': bench_knn, 'search': bench_search, 'parse': bench_parse,
+              'ann': bench_ann, 'embeddings': bench_embeddings, 'parse_workers': bench_parse_workers,
+              'scrape': bench_scrape}
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run a benchmark.')
+    parser.add_argument('name', choices=sorted(BENCHMARKS))
+    BENCHMARKS[parser.parse_args().name]()
@@ -0,0 +1,234 @@
+"""
+CSC111 Project 2: Nxt Movie
+
+Module Description
+==================
+The movie catalogue shared by every session of the app. The catalogue is loaded from the database once per process,
+and reloaded in the background whenever the movies table changes.
+
+Copyright and Usage Information
+===============================
+
+The file is expressly provided for the purposes of course assessments for CSC111 at the University of Toronto.
+All forms of distribution of this code, whether as given or with any changes, are expressly prohibited.
+
+© 2024 Umair Arham, Abdallah Arham Wajid Mohammed, Sameer Shahed, All Rights Reserved
+"""
+
+from __future__ import annotations
+import decimal
+import threading
+from typing import Any, Callable, ContextManager, Optional
+import pandas as pd
+import artifacts
+import filter_table
+import recommender
+import trees
+
+# The number of seconds between two checks of whether the movies table has changed
+POLL_INTERVAL = 300.0
+
+# The query used to detect changes to the movies table. Upserted scores change the sums without adding rows, and
+# upserted text (such as a new description, genres or rating) changes the sum of the checksums of the rows.
+VERSION_QUERY = ('SELECT COUNT(*), MAX(id), ROUND(SUM(metacritic), 2), ROUND(SUM(audience), 2), '
+                 'SUM(CAST(BINARY_CHECKSUM(title, image, release, rating, description, directors, runtime, genres) '
+                 'AS BIGINT)) FROM movies')
+
+
+class Catalogue:
+    """
+    A snapshot of every movie in the database, along with all the data structures built from it. A Catalogue is
+    shared between all sessions, so it must never be mutated once built.
+
+    Instance Attributes:
+        version:
+            The version of the movies table this catalogue was loaded from.
+        df:
+            A pandas dataframe of all the movies and their attributes.
+        index:
+            The NeighbourIndex holding the most similar movies of every movie.
+        movies:
+            A list of all the movie objects in the dataset.
+        titles:
+            The TitleIndex of all the movie objects, used to look movies up by name.
+        filter_index:
+            The FilterIndex of all the movies, used to answer the user's filters.
+        filters:
+            All the available filters, as returned by trees.get_all_filters.
+        filter_table:
+            The precomputed results of the most common filters for this version, or None if there are none.
+    """
+
+    version: tuple
+    df: pd.DataFrame
+    index: recommender.NeighbourIndex
+    movies: list[trees.Movie]
+    titles: trees.TitleIndex
+    filter_index: trees.FilterIndex
+    filters: dict[str, Any]
+    filter_table: Optional[filter_table.FilterTable]
+
+    def __init__(self, version: tuple, df: pd.DataFrame, index: Optional[recommender.NeighbourIndex] = None,
+                 table: Optional[filter_table.FilterTable] = None) -> None:
+        self.version = version
+        self.df = df
+        self.index = index if index is not None else recommender.create_neighbour_index(df)
+        self.movies = trees.read_in_movies(df)
+        self.titles = trees.TitleIndex(self.movies)
+        self.filter_index = trees.FilterIndex(self.movies)
+        self.filters = trees.get_all_filters(self.movies)
+        self.filter_table = table
+
+
+def get_version(conn: Any) -> tuple:
+    """
+    Return the current version of the movies table: its row count, its largest id, the sums of its scores and the sum
+    of the checksums of its other columns. Any insert or upsert that changes a movie changes the version, except in
+    the rare case of a checksum collision.
+
+    Decimals, which pyodbc returns for the rounded sums of DECIMAL columns, are converted to floats, so the version
+    equals the one saved in the manifest of the artifacts built from it.
+    """
+    cursor = conn.cursor()
+    cursor.execute(VERSION_QUERY)
+    version = tuple(float(v) if isinstance(v, decimal.Decimal) else v for v in cursor.fetchone())
+    cursor.close()
+
+    return version
+
+
+def load_catalogue(conn: Any, artifact_dir: Optional[str] = None, previous: Optional[Catalogue] = None) -> Catalogue:
+    """
+    Load every movie from the database using the given connection, and build a Catalogue from them.
+
+    If artifact_dir contains artifacts built from the current version of the movies table, the movies, their
+    NeighbourIndex and their FilterTable are memory mapped from there instead. Otherwise, there is no FilterTable,
+    and if a previous catalogue is given, its NeighbourIndex is updated with recommender.update_neighbour_index
+    rather than rebuilt.
+    """
+    version = get_version(conn)
+
+    if artifact_dir is not None:
+        saved = artifacts.load_artifacts(artifact_dir)
+        if saved is not None and saved.source_version == version:
+            return Catalogue(version, saved.df, saved.index, saved.filter_table)
+
+    df = pd.read_sql('SELECT * FROM movies', conn)
+    df.drop(columns='id', inplace=True)
+
+    if previous is not None:
+        return Catalogue(version, df, recommender.update_neighbour_index(previous.index, previous.df, df))
+
+    return Catalogue(version, df)
+
+
+class CatalogueService:
+    """
+    Owns the Catalogue of a process. The catalogue is loaded on first use, and a background thread polls the
+    database for changes to the movies table, building a new Catalogue and swapping it in when one is found. Sessions
+    that called current() before the swap keep using the catalogue they were given.
+
+    Instance Attributes:
+        connect:
+            A function returning a context manager that yields a connection to the database for the duration of a
+            with block, such as repository.connection.
+        poll_interval:
+            The number of seconds between two checks of whether the movies table has changed.
+        artifact_dir:
+            The directory precomputed artifacts are loaded from, or None to always build the catalogue from scratch.
+    """
+    # Private Instance Attributes:
+    #   - _catalogue:
+    #       The current catalogue, or None if it has not been loaded yet.
+    #   - _lock:
+    #       Held while loading a catalogue, so that only one thread loads at a time.
+    #   - _stop:
+    #       Set when the background refresh thread should exit.
+    #   - _thread:
+    #       The background refresh thread, or None if it has not been started.
+
+    connect: Callable[[], ContextManager[Any]]
+    poll_interval: float
+    artifact_dir: Optional[str]
+    _catalogue: Optional[Catalogue]
+    _lock: threading.Lock
+    _stop: threading.Event
+    _thread: Optional[threading.Thread]
+
+    def __init__(self, connect: Callable[[], ContextManager[Any]], poll_interval: float = POLL_INTERVAL,
+                 artifact_dir: Optional[str] = None) -> None:
+        self.connect = connect
+        self.poll_interval = poll_interval
+        self.artifact_dir = artifact_dir
+        self._catalogue = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def current(self) -> Catalogue:
+        """
+        Return the current catalogue, loading it first if it has not been loaded yet.
+        """
+        catalogue = self._catalogue
+
+        if catalogue is None:
+            with self._lock:
+                if self._catalogue is None:
+                    with self.connect() as conn:
+                        self._catalogue = load_catalogue(conn, self.artifact_dir)
+                catalogue = self._catalogue
+
+        return catalogue
+
+    def refresh(self) -> bool:
+        """
+        Reload the catalogue if the movies table has changed since it was loaded. Return whether it was reloaded.
+        """
+        with self._lock, self.connect() as conn:
+            if self._catalogue is not None and get_version(conn) == self._catalogue.version:
+                return False
+
+            # Build the new catalogue completely before swapping it in, so readers never see a partial one
+            self._catalogue = load_catalogue(conn, self.artifact_dir, self._catalogue)
+            return True
+
+    def start(self) -> None:
+        """
+        Start polling the database for changes in a background thread. Do nothing if it is already running.
+        """
+        if self._thread is not None:
+            return
+
+        self._thread = threading.Thread(target=self._poll, name='catalogue-refresh', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop the background thread started by start().
+        """
+        self._stop.set()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _poll(self) -> None:
+        """
+        Check for changes to the movies table every poll_interval seconds until stop() is called.
+        """
+        while not self._stop.wait(self.poll_interval):
+            try:
+                if self.refresh():
+                    print(f'Catalogue refreshed to version {self._catalogue.version}')
+            except Exception as e:
+                print(f'Failed to refresh the catalogue. Error: {e}')
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['__future__', 'decimal', 'threading', 'typing', 'pandas', 'artifacts', 'filter_table',
+                          'recommender', 'trees'],
+        'max-line-length': 120
+    })
@@ -0,0 +1,282 @@
+"""
+CSC111 Project 2: Nxt Movie
+
+Module Description
+==================
+A thread-safe pool of database connections. Opening a connection to the Azure SQL Database takes several round
+trips, so connections are opened once, checked out for the duration of a unit of work and then returned to the
+pool for the next caller.
+
+Copyright and Usage Information
+===============================
+
+The file is expressly provided for the purposes of course assessments for CSC111 at the University of Toronto.
+All forms of distribution of this code, whether as given or with any changes, are expressly prohibited.
+
+© 2024 Umair Arham, Abdallah Arham Wajid Mohammed, Sameer Shahed, All Rights Reserved
+"""
+
+from __future__ import annotations
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+# The query run to check that a connection still works
+HEALTH_QUERY = 'SELECT 1'
+
+
+class PoolTimeout(Exception):
+    """
+    Raised when no connection could be checked out of a pool in time.
+    """
+
+
+class ConnectionPool:
+    """
+    A pool of between min_size and max_size open connections.
+
+    Connections are checked out with connection(), which blocks while all max_size connections are in use. A
+    connection that has been idle for more than health_interval seconds is checked with HEALTH_QUERY before being
+    handed out, and replaced if the check fails. Idle connections beyond min_size are closed after idle_timeout
+    seconds.
+
+    Instance Attributes:
+        connect:
+            A function returning a new connection.
+        min_size:
+            The number of connections kept open even when idle.
+        max_size:
+            The maximum number of connections open at once.
+        idle_timeout:
+            The number of seconds after which an idle connection beyond min_size is closed.
+        health_interval:
+            The number of seconds a connection may sit idle before it is checked on checkout.
+        checkout_timeout:
+            The number of seconds to wait for a connection before raising PoolTimeout.
+    """
+    # Private Instance Attributes:
+    #   - _idle:
+    #       The pairs (connection, time it was returned) of the idle connections, most recently returned last.
+    #   - _size:
+    #       The number of open connections, idle or in use, including ones being opened.
+    #   - _closed:
+    #       Whether close() has been called. Connections returned after that are closed.
+    #   - _condition:
+    #       Guards every other private attribute, and is notified whenever a connection is returned or closed.
+    #   - _stats:
+    #       The counters reported by stats().
+
+    connect: Callable[[], Any]
+    min_size: int
+    max_size: int
+    idle_timeout: float
+    health_interval: float
+    checkout_timeout: float
+    _idle: list[tuple[Any, float]]
+    _size: int
+    _closed: bool
+    _condition: threading.Condition
+    _stats: dict[str, float]
+
+    def __init__(self, connect: Callable[[], Any], min_size: int = 1, max_size: int = 10,
+                 idle_timeout: float = 300.0, health_interval: float = 30.0, checkout_timeout: float = 30.0) -> None:
+        self.connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_interval = health_interval
+        self.checkout_timeout = checkout_timeout
+        self._idle = []
+        self._size = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._stats = {'checkouts': 0, 'waits': 0, 'wait_time': 0.0, 'max_wait': 0.0, 'timeouts': 0,
+                       'opened': 0, 'closed': 0, 'health_failures': 0}
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """
+        Check out a connection for the duration of a with block, and return it to the pool afterwards. If the block
+        raises an error, the connection's open transaction is rolled back first.
+        """
+        conn = self._checkout()
+
+        try:
+            yield conn
+        except BaseException:
+            try:
+                conn.rollback()
+            except Exception:  # pylint: disable=broad-exception-caught
+                self._discard(conn)
+                raise
+            self._return(conn)
+            raise
+
+        self._return(conn)
+
+    def stats(self) -> dict[str, float]:
+        """
+        Return the pool's metrics: the number of open, in use and idle connections, along with the number of
+        checkouts, how many had to wait for a connection and for how long in total (wait_time) and at most
+        (max_wait), in seconds, how many timed out, and the number of connections opened, closed and replaced after a
+        failed health check.
+        """
+        with self._condition:
+            return {'size': self._size, 'in_use': self._size - len(self._idle), 'idle': len(self._idle),
+                    **self._stats}
+
+    def close(self) -> None:
+        """
+        Close every idle connection. Connections in use are closed when they are returned, and no connection can be
+        checked out anymore.
+        """
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._closed = True
+            self._size -= len(idle)
+            self._stats['closed'] += len(idle)
+            self._condition.notify_all()
+
+        for conn, _ in idle:
+            _close(conn)
+
+    def _checkout(self) -> Any:
+        """
+        Return an idle connection, or a new one if there are none and fewer than max_size are open, waiting for one
+        to be returned otherwise.
+        """
+        start = time.monotonic()
+        waited = False
+
+        with self._condition:
+            if self._closed:
+                raise RuntimeError('The connection pool is closed')
+            self._stats['checkouts'] += 1
+
+            while not self._idle and self._size >= self.max_size and not self._closed:
+                remaining = start + self.checkout_timeout - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(f'No connection available after {self.checkout_timeout}s')
+                waited = True
+                self._condition.wait(remaining)
+
+            if self._closed:
+                raise RuntimeError('The connection pool is closed')
+
+            if waited:
+                wait = time.monotonic() - start
+                self._stats['waits'] += 1
+                self._stats['wait_time'] += wait
+                self._stats['max_wait'] = max(self._stats['max_wait'], wait)
+
+            expired = self._expired()
+            if self._idle:
+                conn, returned = self._idle.pop()
+            else:
+                conn, returned = None, 0.0
+                self._size += 1
+
+        for old in expired:
+            _close(old)
+
+        if conn is not None and time.monotonic() - returned <= self.health_interval:
+            return conn
+
+        if conn is not None:
+            if _healthy(conn):
+                return conn
+            _close(conn)
+            with self._condition:
+                self._stats['health_failures'] += 1
+                self._stats['closed'] += 1
+
+        try:
+            conn = self.connect()
+        except BaseException:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+
+        with self._condition:
+            self._stats['opened'] += 1
+
+        return conn
+
+    def _return(self, conn: Any) -> None:
+        """
+        Put a checked out connection back in the pool, or close it if the pool has been closed.
+        """
+        with self._condition:
+            closing = self._closed
+            if closing:
+                self._size -= 1
+                self._stats['closed'] += 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._condition.notify()
+
+        if closing:
+            _close(conn)
+
+    def _discard(self, conn: Any) -> None:
+        """
+        Close a checked out connection that can no longer be used, making room for a new one.
+        """
+        with self._condition:
+            self._size -= 1
+            self._stats['closed'] += 1
+            self._condition.notify()
+
+        _close(conn)
+
+    def _expired(self) -> list[Any]:
+        """
+        Remove the connections idle for longer than idle_timeout from the pool, keeping at least min_size open, and
+        return them to be closed. The caller must hold _condition.
+        """
+        now = time.monotonic()
+        expired = []
+
+        # The least recently returned connections come first
+        while self._idle and self._size > self.min_size and now - self._idle[0][1] > self.idle_timeout:
+            expired.append(self._idle.pop(0)[0])
+            self._size -= 1
+            self._stats['closed'] += 1
+
+        return expired
+
+
+def _healthy(conn: Any) -> bool:
+    """
+    Return whether the given connection can still run a query.
+    """
+    try:
+        cursor = conn.cursor()
+        cursor.execute(HEALTH_QUERY)
+        cursor.fetchall()
+        cursor.close()
+        return True
+    except Exception:  # pylint: disable=broad-exception-caught
+        return False
+
+
+def _close(conn: Any) -> None:
+    """
+    Close the given connection, ignoring any error, as it is being thrown away.
+    """
+    try:
+        conn.close()
+    except Exception:  # pylint: disable=broad-exception-caught
+        pass
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['__future__', 'threading', 'time', 'contextlib', 'typing'],
+        'max-line-length': 120
+    })
@@ -0,0 +1,121 @@
+"""
+CSC111 Project 2: Nxt Movie
+
+Module Description
+==================
+Dense embeddings of the movies' combined text. The wide, sparse TF-IDF vectors are reduced with TruncatedSVD (latent
+semantic analysis) to a few hundred dimensions, stored as L2-normalized float32 rows of one contiguous array, so the
+cosine similarity of two movies is the dot product of their rows, and the similarities of many movies are one matrix
+multiplication.
+
+The embeddings only exist while a neighbour index is built. Like every other backend, EmbeddingBackend leaves a
+NeighbourIndex holding the neighbours, their scores and the full TF-IDF matrix, and the artifacts save the same, so
+the app uses no less memory than with an index built from the TF-IDF vectors. What the embeddings save is the time
+and peak memory of the build, and since neither they nor the fitted TruncatedSVD are kept, every update of such an
+index fits them again from scratch.
+
+Copyright and Usage Information
+===============================
+
+The file is expressly provided for the purposes of course assessments for CSC111 at the University of Toronto.
+All forms of distribution of this code, whether as given or with any changes, are expressly prohibited.
+
+© 2024 Umair Arham, Abdallah Arham Wajid Mohammed, Sameer Shahed, All Rights Reserved
+"""
+
+from __future__ import annotations
+from typing import Optional
+import numpy as np
+from scipy import sparse
+from sklearn.decomposition import TruncatedSVD
+import recommender
+
+# The default number of dimensions of an embedding
+DIMENSIONS = 256
+
+
+def svd_embeddings(matrix: sparse.spmatrix, dimensions: int = DIMENSIONS, seed: int = 0) -> np.ndarray:
+    """
+    Return the (N, d) float32 array of the L2-normalized embeddings of the rows of the given TF-IDF matrix, where d
+    is dimensions, or one less than the number of columns of the matrix if that is smaller. Rows with no terms have
+    an embedding of all zeros.
+    """
+    dimensions = max(1, min(dimensions, matrix.shape[1] - 1))
+    reduced = TruncatedSVD(n_components=dimensions, random_state=seed).fit_transform(matrix)
+
+    return normalize_rows(reduced.astype(np.float32))
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """
+    Return a C-contiguous float32 copy of the given array with every nonzero row scaled to unit length.
+    """
+    vectors = np.array(vectors, dtype=np.float32, order='C')
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+
+    return vectors
+
+
+def dense_top_k(vectors: np.ndarray, k: int, chunk_size: Optional[int] = None,
+                rows: Optional[np.ndarray] = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Return the rows of the k most similar rows of the given L2-normalized embeddings for every row, along with their
+    cosine similarities, as an (N, k) int32 array and an (N, k) float32 array. The similarities of chunk_size rows
+    (by default, as many as fit in recommender.MEMORY_BUDGET) are computed at once, as a single matrix multiplication.
+
+    If rows is given, only the neighbours of those rows are returned, in the same order.
+    """
+    n = len(vectors) if rows is None else len(rows)
+    k = min(k, len(vectors))
+    chunk_size = recommender.chunk_rows(len(vectors), chunk_size)
+
+    neighbours = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=np.float32)
+
+    for start in range(0, n, chunk_size):
+        chunk = vectors[start:start + chunk_size] if rows is None else vectors[rows[start:start + chunk_size]]
+        block = chunk @ vectors.T
+        top = recommender.top_k_columns(block, k)
+        neighbours[start:start + len(block)] = top
+        scores[start:start + len(block)] = np.take_along_axis(block, top, axis=1)
+
+    return neighbours, scores
+
+
+class EmbeddingBackend(recommender.SimilarityBackend):
+    """
+    A SimilarityBackend comparing every movie with every other movie by the cosine similarity of their TruncatedSVD
+    embeddings instead of their TF-IDF vectors. The embeddings take a fraction of the memory of the TF-IDF matrix and
+    are compared with dense matrix multiplications, at the cost of neighbours that differ from those of TF-IDF. They
+    are discarded once the neighbours are found, so this only makes building the index cheaper.
+
+    Instance Attributes:
+        dimensions:
+            The number of dimensions of the embeddings.
+        seed:
+            The seed of TruncatedSVD, so the same catalogue always gets the same neighbours.
+    """
+
+    dimensions: int
+    seed: int
+
+    def __init__(self, dimensions: int = DIMENSIONS, seed: int = 0) -> None:
+        self.dimensions = dimensions
+        self.seed = seed
+
+    def top_k(self, matrix: sparse.csr_matrix, k: int,
+              chunk_size: Optional[int] = None) -> tuple[np.ndarray, np.ndarray]:
+        return dense_top_k(svd_embeddings(matrix, self.dimensions, self.seed), k, chunk_size)
+
+    def tfidf_scores(self) -> bool:
+        return False
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['__future__', 'typing', 'numpy', 'scipy', 'sklearn.decomposition', 'recommender'],
+        'max-line-length': 120
+    })
@@ -0,0 +1,226 @@
+"""
+CSC111 Project 2: Nxt Movie
+
+Module Description
+==================
+The HTTP layer of the scraper. Pages are fetched over a shared session that keeps connections alive, several at a
+time, while limiting the rate of requests sent to each host and retrying failed requests. Pages can be kept in an
+HttpCache, so that unchanged pages are not downloaded again.
+
+Copyright and Usage Information
+===============================
+
+The file is expressly provided for the purposes of course assessments for CSC111 at the University of Toronto.
+All forms of distribution of this code, whether as given or with any changes, are expressly prohibited.
+
+© 2024 Umair Arham, Abdallah Arham Wajid Mohammed, Sameer Shahed, All Rights Reserved
+"""
+
+from __future__ import annotations
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from http_cache import CachedResponse, CacheStats, HttpCache
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (iPad; CPU OS 12_2 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) '
+                  'Mobile/15E148'
+}
+
+# Responses with these status codes are retried, as the server may answer the same request later
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """
+    Spaces out requests to each host so that at most requests_per_second requests are started per second per host.
+
+    Instance Attributes:
+        interval:
+            The minimum number of seconds between the start of two requests to the same host.
+    """
+    # Private Instance Attributes:
+    #   - _next:
+    #       A mapping from each host to the earliest time the next request to it may start.
+    #   - _lock:
+    #       Held while reading or updating _next.
+
+    interval: float
+    _next: dict[str, float]
+    _lock: threading.Lock
+
+    def __init__(self, requests_per_second: float) -> None:
+        self.interval = 1 / requests_per_second if requests_per_second > 0 else 0.0
+        self._next = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host: str) -> None:
+        """
+        Block until a request to the given host may start.
+        """
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next.get(host, now))
+            self._next[host] = start + self.interval
+
+        if start > now:
+            time.sleep(start - now)
+
+
+class Fetcher:
+    """
+    Fetches web pages concurrently over a pooled, keep-alive HTTP session.
+
+    Instance Attributes:
+        max_workers:
+            The maximum number of requests in flight at once.
+        retries:
+            The number of times a request is retried after a connection error, a timeout or a status in
+            RETRY_STATUSES.
+        backoff:
+            The number of seconds waited before the first retry. The wait doubles after every retry.
+        timeout:
+            The number of seconds to wait for the server to connect or send data before giving up.
+        session:
+            The HTTP session shared by all requests.
+        limiter:
+            The RateLimiter spacing out requests to each host.
+        cache:
+            The HttpCache pages are kept in, or None if pages are always downloaded.
+        stats:
+            The CacheStats of every page requested through this fetcher.
+    """
+
+    max_workers: int
+    retries: int
+    backoff: float
+    timeout: float
+    session: requests.Session
+    limiter: RateLimiter
+    cache: Optional[HttpCache]
+    stats: CacheStats
+
+    def __init__(self, max_workers: int = 8, requests_per_second: float = 5.0, retries: int = 3,
+                 backoff: float = 0.5, timeout: float = 10.0, cache: Optional[HttpCache] = None) -> None:
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.limiter = RateLimiter(requests_per_second)
+        self.cache = cache
+        self.stats = CacheStats()
+
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def __enter__(self) -> Fetcher:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def get(self, url: str) -> requests.Response | CachedResponse:
+        """
+        Return the response to a GET request for the given url, retrying failed requests. If the last attempt fails
+        with a connection error or timeout, that error is raised.
+
+        If this fetcher has a cache, a page cached less than its ttl ago is returned without a request. An older
+        cached page is requested conditionally, and returned if the server answers that it has not changed.
+        Otherwise, the downloaded page replaces it in the cache.
+        """
+        cached = self.cache.get(url) if self.cache is not None else None
+
+        if cached is not None and self.cache.is_fresh(cached):
+            self.stats.record('hits', cached.size)
+            return cached
+
+        response = self._request(url, HttpCache.validators(cached))
+
+        if cached is not None and response.status_code == 304:
+            self.cache.revalidate(cached, response)
+            self.stats.record('revalidated', cached.size)
+            return cached
+
+        if self.cache is not None:
+            self.cache.store(url, response)
+
+        self.stats.record('misses', len(response.content))
+        return response
+
+    def _request(self, url: str, headers: dict[str, str]) -> requests.Response:
+        """
+        Return the response to a GET request for the given url with the given extra headers, retrying failed
+        requests as described in get.
+        """
+        host = urlsplit(url).netloc
+        delay = self.backoff
+
+        for _ in range(self.retries):
+            self.limiter.wait(host)
+
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+
+                delay = max(delay, _retry_after(response))
+
+            except (requests.ConnectionError, requests.Timeout):
+                pass
+
+            time.sleep(delay)
+            delay *= 2
+
+        self.limiter.wait(host)
+        return self.session.get(url, headers=headers, timeout=self.timeout)
+
+    def get_many(self, urls: list[str]) -> list[Optional[requests.Response | CachedResponse]]:
+        """
+        Fetch all the given urls, at most max_workers at a time, and return their responses in the same order. The
+        response of a url is None if it could not be fetched.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(self._get_or_none, urls))
+
+    def close(self) -> None:
+        """
+        Close every connection held by this fetcher.
+        """
+        self.session.close()
+
+    def _get_or_none(self, url: str) -> Optional[requests.Response | CachedResponse]:
+        """
+        Return the response to a GET request for the given url, or None if it could not be fetched.
+        """
+        try:
+            return self.get(url)
+        except requests.RequestException as e:
+            print(f'Failed to fetch {url}. Error: {e}')
+            return None
+
+
+def _retry_after(response: requests.Response) -> float:
+    """
+    Return the number of seconds the server asked to wait before retrying, or 0 if it did not say.
+    """
+    try:
+        return float(response.headers.get('Retry-After', 0))
+    except ValueError:
+        return 0.0
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['__future__', 'threading', 'time', 'concurrent.futures', 'typing', 'urllib.parse',
+                          'requests', 'requests.adapters', 'http_cache'],
+        'max-line-length': 120
+    })
@@ -0,0 +1,134 @@
+"""
+CSC111 Project 2: Nxt Movie
+
+Module Description
+==================
+A table of the recommendations for the most common filters, computed offline along with the other artifacts so the app
+can answer them without ranking any movies.
+
+Most users pick a single genre and a single pg-rating and keep the full range of release years, so the table holds the
+results of every such combination, for every score band. The results are stored as one row of movie indices per
+combination, padded with -1, in the order of the movies table they were computed from. artifacts.py saves the table
+in the artifact version directory, and the app only uses it while that version matches the movies table.
+
+Copyright and Usage Information
+===============================
+
+The file is expressly provided for the purposes of course assessments for CSC111 at the University of Toronto.
+All forms of distribution of this code, whether as given or with any changes, are expressly prohibited.
+
+© 2024 Umair Arham, Abdallah Arham Wajid Mohammed, Sameer Shahed, All Rights Reserved
+"""
+
+from __future__ import annotations
+from typing import Any, Optional, Sequence
+import numpy as np
+import pandas as pd
+import recommender
+import trees
+
+# The score bands a user can select, as passed in user_filters['score']
+SCORES = ('HIGH', 'LOW', 'BOTH')
+
+# The number of movies recommended for a combination of filters, as returned by recommendation_engine_filters
+LIMIT = 20
+
+
+class FilterTable:
+    """
+    The precomputed results of recommendation_engine_filters for every combination of a single genre, a single
+    pg-rating and a score band, over the full range of release years.
+
+    Instance Attributes:
+        release_range:
+            The range of release years every result was computed for, as in user_filters['rel'].
+        results:
+            The (combinations, LIMIT) array of the indices of the movies recommended for each combination, best first
+            and padded with -1.
+    """
+    # Private Instance Attributes:
+    #   - _rows:
+    #       A mapping from each (genre, rating, score) combination to its row of results.
+    #   - _titles:
+    #       The names of the movies, indexed by the results.
+
+    release_range: tuple
+    results: np.ndarray
+    _rows: dict[tuple[str, str, str], int]
+    _titles: Sequence[str]
+
+    def __init__(self, keys: list[tuple[str, str, str]], results: np.ndarray, titles: Sequence[str],
+                 release_range: tuple) -> None:
+        self.release_range = tuple(release_range)
+        self.results = results
+        self._rows = {tuple(key): i for i, key in enumerate(keys)}
+        self._titles = titles
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def keys(self) -> list[tuple[str, str, str]]:
+        """
+        Return the (genre, rating, score) combinations in this table, in the order of its rows.
+        """
+        return list(self._rows)
+
+    def lookup(self, user_filters: dict[str, Any]) -> Optional[list[str]]:
+        """
+        Return the names of the movies recommended for the given user filters, as built by main.run_gui, or None if
+        they are not in this table.
+        """
+        if len(user_filters['genre']) != 1 or len(user_filters['rating']) != 1 \
+                or tuple(user_filters['rel']) != self.release_range:
+            return None
+
+        row = self._rows.get((user_filters['genre'][0], user_filters['rating'][0], user_filters['score']))
+        if row is None:
+            return None
+
+        return [self._titles[i] for i in self.results[row] if i >= 0]
+
+
+def filter_combinations(filters: dict[str, Any]) -> list[tuple[str, str, str]]:
+    """
+    Return every (genre, rating, score) combination of the given available filters, as returned by
+    trees.get_all_filters, in a fixed order.
+    """
+    return [(genre, rating, score) for genre in sorted(filters['genre']) for rating in sorted(filters['rating'])
+            for score in SCORES]
+
+
+def build_filter_table(df: pd.DataFrame) -> FilterTable:
+    """
+    Compute the FilterTable of the movies in the given dataframe, ranking the matches of every combination in
+    filter_combinations exactly as the app does. Combinations matching no movie are kept, with no results.
+    """
+    movies = trees.read_in_movies(df)
+    titles = trees.TitleIndex(movies)
+    filter_index = trees.FilterIndex(movies)
+    filters = trees.get_all_filters(movies)
+
+    keys = filter_combinations(filters)
+    results = np.full((len(keys), LIMIT), -1, dtype=np.int32)
+    rows = {}
+    for i, title in enumerate(df['title']):
+        rows.setdefault(title, i)
+
+    for i, (genre, rating, score) in enumerate(keys):
+        user_filters = {'genre': [genre], 'rating': [rating], 'score': score, 'rel': filters['rel']}
+        matched = filter_index.matching(user_filters)
+
+        if matched:
+            names = recommender.recommendation_engine_filters(trees.convert_to_movie_obj(matched, titles))[:LIMIT]
+            results[i, :len(names)] = [rows[name] for name in names]
+
+    return FilterTable(keys, results, df['title'].tolist(), filters['rel'])
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['__future__', 'typing', 'numpy', 'pandas', 'recommender', 'trees'],
+        'max-line-length': 120
+    })
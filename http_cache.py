@@ -0,0 +1,317 @@
+"""
+CSC111 Project 2: Nxt Movie
+
+Module Description
+==================
+An on-disk cache of the pages fetched by the scraper, so that running the scraper again only downloads the pages that
+changed. Each page is stored under a hash of its url as a gzip compressed body, next to a small json file holding its
+validators (its ETag and Last-Modified headers), when it was last known to be up to date, and the data the scraper
+parsed from it.
+
+Pages checked less than ttl seconds ago are served without sending a request. Older pages are revalidated with a
+conditional request, which the server answers with 304 Not Modified and no body if the page has not changed.
+
+Copyright and Usage Information
+===============================
+
+The file is expressly provided for the purposes of course assessments for CSC111 at the University of Toronto.
+All forms of distribution of this code, whether as given or with any changes, are expressly prohibited.
+
+© 2024 Umair Arham, Abdallah Arham Wajid Mohammed, Sameer Shahed, All Rights Reserved
+"""
+
+from __future__ import annotations
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Optional
+import requests
+
+# The directory pages are cached in by default
+CACHE_DIR = 'http_cache'
+
+# The default number of seconds a cached page is served without checking whether it changed
+DEFAULT_TTL = 24 * 60 * 60
+
+
+class CachedResponse:
+    """
+    A page served from an HttpCache, standing in for the requests.Response it was stored from. The body is only read
+    from disk when content is first accessed, so pages whose parsed data is cached are never decompressed.
+
+    Instance Attributes:
+        url:
+            The url of the page.
+        status_code:
+            The status code of the cached response, which is always 200.
+        headers:
+            The validators of the cached response, as headers.
+        checked:
+            The time, in seconds since the epoch, at which the page was last known to be up to date.
+        size:
+            The uncompressed size of the body, in bytes.
+        parsed:
+            A mapping from each kind of data parsed from the page to the data, as stored with HttpCache.store_parsed.
+    """
+    # Private Instance Attributes:
+    #   - _body_path:
+    #       The path of the compressed body.
+    #   - _content:
+    #       The body, or None if it has not been read yet.
+
+    url: str
+    status_code: int
+    headers: dict[str, str]
+    checked: float
+    size: int
+    parsed: dict[str, Any]
+    _body_path: str
+    _content: Optional[bytes]
+
+    def __init__(self, url: str, meta: dict[str, Any], body_path: str) -> None:
+        self.url = url
+        self.status_code = 200
+        self.headers = {name: meta[key] for name, key in (('ETag', 'etag'), ('Last-Modified', 'last_modified'))
+                        if meta.get(key)}
+        self.checked = meta['checked']
+        self.size = meta['size']
+        self.parsed = meta.get('parsed', {})
+        self._body_path = body_path
+        self._content = None
+
+    @property
+    def content(self) -> bytes:
+        """
+        Return the body of the page.
+        """
+        if self._content is None:
+            with gzip.open(self._body_path, 'rb') as f:
+                self._content = f.read()
+
+        return self._content
+
+
+class CacheStats:
+    """
+    Counts how the pages requested through a Fetcher were served, and the bandwidth the cache saved.
+
+    Instance Attributes:
+        hits:
+            The number of pages served from the cache without sending a request.
+        revalidated:
+            The number of pages served from the cache after the server answered 304 Not Modified.
+        misses:
+            The number of pages downloaded.
+        downloaded:
+            The number of bytes of the bodies downloaded.
+        saved:
+            The number of bytes of the bodies served from the cache instead of being downloaded.
+    """
+    # Private Instance Attributes:
+    #   - _lock:
+    #       Held while updating the counts, as pages are fetched from several threads.
+
+    hits: int
+    revalidated: int
+    misses: int
+    downloaded: int
+    saved: int
+    _lock: threading.Lock
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.downloaded = 0
+        self.saved = 0
+        self._lock = threading.Lock()
+
+    def __str__(self) -> str:
+        requested = self.hits + self.revalidated + self.misses
+        rate = (self.hits + self.revalidated) / requested if requested else 0.0
+
+        return (f'{requested} pages: {self.hits} hits, {self.revalidated} revalidated, {self.misses} misses '
+                f'({rate:.0%} from cache), {self.downloaded / 2 ** 20:.1f} MiB downloaded, '
+                f'{self.saved / 2 ** 20:.1f} MiB saved')
+
+    def record(self, kind: str, size: int) -> None:
+        """
+        Count a page of the given size in bytes served in the given way: 'hits', 'revalidated' or 'misses'.
+        """
+        with self._lock:
+            setattr(self, kind, getattr(self, kind) + 1)
+
+            if kind == 'misses':
+                self.downloaded += size
+            else:
+                self.saved += size
+
+    def copy(self) -> CacheStats:
+        """
+        Return a copy of these counts, which is not updated further.
+        """
+        copy = CacheStats()
+
+        with self._lock:
+            for name in ('hits', 'revalidated', 'misses', 'downloaded', 'saved'):
+                setattr(copy, name, getattr(self, name))
+
+        return copy
+
+    def since(self, earlier: CacheStats) -> CacheStats:
+        """
+        Return the counts recorded since the given copy of these counts was made.
+        """
+        difference = self.copy()
+
+        for name in ('hits', 'revalidated', 'misses', 'downloaded', 'saved'):
+            setattr(difference, name, getattr(difference, name) - getattr(earlier, name))
+
+        return difference
+
+
+class HttpCache:
+    """
+    An on-disk cache of web pages keyed by their url.
+
+    Instance Attributes:
+        directory:
+            The directory the pages are stored in.
+        ttl:
+            The number of seconds after a page was last checked during which it is served without checking whether
+            it changed.
+    """
+
+    directory: str
+    ttl: float
+
+    def __init__(self, directory: str = CACHE_DIR, ttl: float = DEFAULT_TTL) -> None:
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        """
+        Return the cached page of the given url, or None if it is not cached.
+        """
+        meta = self._read_meta(url)
+        if meta is None or meta.get('url') != url or not os.path.exists(self._path(url, '.gz')):
+            return None
+
+        return CachedResponse(url, meta, self._path(url, '.gz'))
+
+    def is_fresh(self, cached: CachedResponse) -> bool:
+        """
+        Return whether the given cached page was checked recently enough to be served without a request.
+        """
+        return time.time() - cached.checked < self.ttl
+
+    @staticmethod
+    def validators(cached: Optional[CachedResponse]) -> dict[str, str]:
+        """
+        Return the headers making a request for the given cached page conditional, so the server only sends the page
+        if it changed.
+        """
+        if cached is None:
+            return {}
+
+        headers = {}
+        if 'ETag' in cached.headers:
+            headers['If-None-Match'] = cached.headers['ETag']
+        if 'Last-Modified' in cached.headers:
+            headers['If-Modified-Since'] = cached.headers['Last-Modified']
+
+        return headers
+
+    def store(self, url: str, response: requests.Response) -> None:
+        """
+        Cache the given response to a request for url, if it is a successful response the server allows caching.
+        Any data parsed from a previous version of the page is discarded.
+        """
+        if response.status_code != 200 or 'no-store' in response.headers.get('Cache-Control', ''):
+            return
+
+        # The old entry is removed first, so that a crash cannot leave the new body with the old parsed data
+        try:
+            os.remove(self._path(url, '.json'))
+        except FileNotFoundError:
+            pass
+
+        body_path = self._path(url, '.gz')
+        tmp = f'{body_path}.{threading.get_ident()}.tmp'
+        with gzip.open(tmp, 'wb') as f:
+            f.write(response.content)
+        os.replace(tmp, body_path)
+
+        self._write_meta(url, {'url': url, 'etag': response.headers.get('ETag'),
+                               'last_modified': response.headers.get('Last-Modified'),
+                               'checked': time.time(), 'size': len(response.content)})
+
+    def revalidate(self, cached: CachedResponse, response: requests.Response) -> None:
+        """
+        Record that the server confirmed with the given 304 Not Modified response that the cached page is still up
+        to date, updating its validators if the server sent new ones.
+        """
+        cached.checked = time.time()
+        cached.headers.update({name: response.headers[name] for name in ('ETag', 'Last-Modified')
+                               if response.headers.get(name)})
+        self._write_meta(cached.url, self._meta(cached))
+
+    def store_parsed(self, url: str, kind: str, data: Any) -> None:
+        """
+        Store data of the given kind parsed from the cached page of the given url, so it does not have to be parsed
+        again until the page changes. Nothing is stored if the page is not cached. The data must be serializable to
+        json.
+        """
+        meta = self._read_meta(url)
+        if meta is not None:
+            meta.setdefault('parsed', {})[kind] = data
+            self._write_meta(url, meta)
+
+    def _meta(self, cached: CachedResponse) -> dict[str, Any]:
+        """
+        Return the json data stored for the given cached page.
+        """
+        return {'url': cached.url, 'etag': cached.headers.get('ETag'),
+                'last_modified': cached.headers.get('Last-Modified'), 'checked': cached.checked,
+                'size': cached.size, 'parsed': cached.parsed}
+
+    def _path(self, url: str, extension: str) -> str:
+        """
+        Return the path of the file with the given extension stored for the given url.
+        """
+        return os.path.join(self.directory, hashlib.sha256(url.encode('utf-8')).hexdigest() + extension)
+
+    def _read_meta(self, url: str) -> Optional[dict[str, Any]]:
+        """
+        Return the json data stored for the given url, or None if there is none.
+        """
+        try:
+            with open(self._path(url, '.json'), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, url: str, meta: dict[str, Any]) -> None:
+        """
+        Atomically replace the json data stored for the given url.
+        """
+        path = self._path(url, '.json')
+        tmp = f'{path}.{threading.get_ident()}.tmp'
+
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+        os.replace(tmp, path)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['__future__', 'gzip', 'hashlib', 'json', 'os', 'threading', 'time', 'typing', 'requests'],
+        'max-line-length': 120
+    })
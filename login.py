@@ -15,7 +15,7 @@ All forms of distribution of this code, whether as given or with any changes, ar
 """
 
 import streamlit as st
-import sql_db
+import repository
 
 
 def verify_email(email: str) -> bool:
@@ -28,26 +28,13 @@ def verify_email(email: str) -> bool:
     Returns:
         bool: True if the email exists, False otherwise.
     """
-    conn = sql_db.connect_to_db()
-
     try:
-        cursor = conn.cursor()
-
-        # Query to check if email exists
-        query = "SELECT email FROM users WHERE email = ?"
-        cursor.execute(query, email)
-        rslt = cursor.fetchone()[0]
-        print("Result: ", rslt)
-
-        return rslt is not None
+        return repository.email_exists(email)
 
     except Exception as e:
         # print(f"An error occurred: {e}")
         return False
 
-    finally:
-        conn.close()
-
 
 def sign_in_with_password(email: str, password: str):
     """
@@ -58,17 +45,12 @@ def sign_in_with_password(email: str, password: str):
     """
 
     try:
-        cursor = sql_db.connect_to_db().cursor()
-        query = "SELECT password FROM users WHERE email = ?"
-        cursor.execute(query, email)
-        db_password = cursor.fetchone()[0]
-        print("DB password: ", db_password)
-        cursor.close()
+        db_password = repository.get_password(email)
 
     except Exception as e:
         return False
 
-    return db_password == password
+    return db_password is not None and db_password == password
 
 
 def login_form() -> str:
@@ -102,13 +84,14 @@ def login_form() -> str:
 
         if signup:
             print('Button clicked')
-            print('Verification: ' + str(verify_email(email)))
+            registered = verify_email(email)
+            print('Verification: ' + str(registered))
 
             if not email:
                 st.warning('Please enter a valid email')
                 return ''
 
-            if not username and not verify_email(email):
+            if not username and not registered:
                 st.warning('Please enter a valid username')
                 return ''
 
@@ -116,13 +99,9 @@ def login_form() -> str:
                 st.warning('Your password must be at least 6 characters long')
                 return ''
 
-            if not verify_email(email):
-                cursor = sql_db.connect_to_db().cursor()
+            if not registered:
+                repository.create_user(username, email, password)
                 print("User created")
-                query = "INSERT INTO users(username, email, password, liked_movies) VALUES (?, ?, ?, ?)"
-                cursor.execute(query, (username, email, password, "[]"))
-                cursor.commit()
-                cursor.close()
                 return username
 
             else:
@@ -131,12 +110,8 @@ def login_form() -> str:
 
                 if correct_pwd:
                     placeholder.empty()
-                    cursor = sql_db.connect_to_db().cursor()
-                    query = "SELECT username FROM users WHERE email = ? AND password = ?"
-                    cursor.execute(query, email, password)
-                    display_name = cursor.fetchone()[0]
+                    display_name = repository.get_username(email, password)
                     print('Username', display_name)
-                    cursor.close()
 
                     return display_name
 
@@ -13,17 +13,36 @@ All forms of distribution of this code, whether as given or with any changes, ar
 
 © 2024 Umair Arham, Abdallah Arham Wajid Mohammed, Sameer Shahed, All Rights Reserved
 """
-import ast
-
 import streamlit as st
 # from firebase_admin import firestore
-import pandas as pd
 
-import sql_db
+import artifacts
+import catalogue
 import trees
 import login
 import scraper
 import recommender
+import repository
+import result_cache
+
+
+@st.cache_resource
+def get_catalogue_service() -> catalogue.CatalogueService:
+    """
+    Return the CatalogueService shared by every session in this process, starting it on first use.
+    """
+    service = catalogue.CatalogueService(repository.connection, artifact_dir=artifacts.ARTIFACT_DIR)
+    service.start()
+
+    return service
+
+
+@st.cache_resource
+def get_result_cache() -> result_cache.ResultCache:
+    """
+    Return the ResultCache of recommendations shared by every session in this process.
+    """
+    return result_cache.ResultCache()
 
 
 def update_session_state() -> None:
@@ -39,9 +58,12 @@ def update_session_state() -> None:
         in the movies the user already liked that were stored in the database.
         - st.session_state['user']: The username of the user. If the user is a guest, firebase is not involved.
         Otherwise, data is extracted/altered from their profile as needed.
-        - st.session_state['data']: Contains a pandas dataframe which includes all the cosine similarities data of all
-        the movies.
-        - st.session_state['movies']: A list of all the movie objects in the dataset.
+        - st.session_state['catalogue']: The Catalogue this session is using, shared with every other session. When
+        a newer catalogue is loaded, the session's favourites and displayed movies are moved over to it.
+        - st.session_state['data']: Contains the NeighbourIndex holding the most similar movies of every movie.
+        - st.session_state['df']: Contains a pandas dataframe of all the movies and their attributes.
+        - st.session_state['movies']: The TitleIndex of all the movie objects in the dataset, which can be used as a
+        list of the movies and looks movies up by name in constant time.
     """
     if 'key' not in st.session_state:
         st.session_state['key'] = set()
@@ -60,12 +82,19 @@ def update_session_state() -> None:
         # except ValueError:  # Only initialize firebase once to avoid ValueError
         #     pass
 
-    if 'data' not in st.session_state and 'movies' not in st.session_state:
-        conn = sql_db.connect_to_db()
-        df = pd.read_sql('SELECT * FROM movies', conn)
-        df.drop(columns='id', axis=1, inplace=True)
-        st.session_state['data'] = recommender.create_data_frame(df)
-        st.session_state['movies'] = trees.read_in_movies(df)
+    current = get_catalogue_service().current()
+
+    if st.session_state.get('catalogue') is not current:
+        if 'catalogue' in st.session_state:
+            st.session_state['favs'] = set(trees.convert_to_movie_obj([m.name for m in st.session_state['favs']],
+                                                                      current.titles))
+            st.session_state['key'] = trees.convert_to_movie_obj([m.name for m in st.session_state['key']],
+                                                                 current.titles)
+
+        st.session_state['catalogue'] = current
+        st.session_state['data'] = current.index
+        st.session_state['df'] = current.df
+        st.session_state['movies'] = current.titles
 
     # Check if the user is not signed in yet
     if not st.session_state['user']:
@@ -73,13 +102,8 @@ def update_session_state() -> None:
         st.session_state['user'] = username
 
         if username and username != 'Guest':
-            conn = sql_db.connect_to_db()
-            cursor = conn.cursor()
-            query = 'SELECT liked_movies FROM users WHERE username = ?;'
-            cursor.execute(query, username)
-
             try:
-                favourites = ast.literal_eval(cursor.fetchone()[0])
+                favourites = repository.get_favourites(username)
                 print('Favourites: ', favourites)
                 for movie in set(trees.convert_to_movie_obj(favourites, st.session_state['movies'])):
                     st.session_state['favs'].add(movie)
@@ -89,7 +113,7 @@ def update_session_state() -> None:
                 st.session_state['favs'] = set()
 
     if st.session_state['key'] == set() and st.session_state['user']:
-        st.session_state['key'] = trees.convert_to_movie_obj(trees.get_random_movies(st.session_state['data']),
+        st.session_state['key'] = trees.convert_to_movie_obj(trees.get_random_movies(st.session_state['df']),
                                                              st.session_state['movies'])
 
 
@@ -119,7 +143,7 @@ def run_gui() -> None:
         st.divider()
 
         # Set the filters
-        all_filters = trees.get_all_filters(st.session_state['movies'])
+        all_filters = st.session_state['catalogue'].filters
         date_range = (all_filters['rel'][0], all_filters['rel'][1])
 
         genre = st.multiselect('Genres', sorted(all_filters['genre']))
@@ -134,10 +158,14 @@ def run_gui() -> None:
                 st.warning('Please input genre and pg-ratings')
 
             user_filters = {'genre': genre, 'rating': rating, 'score': score.upper(), 'rel': release_date}
-            tree = trees.build_tree(st.session_state['movies'])
-            filtered_movies = trees.convert_to_movie_obj(tree.matching(user_filters), st.session_state['movies'])
-
-            filtered_movies = recommender.recommendation_engine_filters(filtered_movies)
+            current = st.session_state['catalogue']
+            filtered_movies = None if current.filter_table is None else current.filter_table.lookup(user_filters)
+
+            if filtered_movies is None:
+                filtered_movies = get_result_cache().get_or_compute(
+                    ('filters', result_cache.normalize_filters(user_filters)), current.version,
+                    lambda: recommender.recommendation_engine_filters(
+                        trees.convert_to_movie_obj(current.filter_index.matching(user_filters), current.titles)))
             # top_movies = recommender.recommendation_engine(filtered_movies, True)
             st.session_state['key'] = trees.convert_to_movie_obj(filtered_movies, st.session_state['movies'])
 
@@ -145,8 +173,10 @@ def run_gui() -> None:
             st.session_state['key'] = st.session_state['favs']
 
         if col3.button('Filter by My Favourites', help='Click to see recommendations based on your liked movies'):
-            recs = recommender.recommendation_engine(st.session_state['favs'], st.session_state['data'],
-                                                     st.session_state['movies'])
+            current, favs = st.session_state['catalogue'], st.session_state['favs']
+            recs = get_result_cache().get_or_compute(
+                ('favourites', sorted(movie.name for movie in favs)), current.version,
+                lambda: recommender.recommendation_engine(favs, current.index, current.titles))
             recs = trees.convert_to_movie_obj(recs, st.session_state['movies'])
             st.session_state['key'] = recs
 
@@ -190,42 +220,18 @@ def display_movies(top_movies: list[trees.Movie]) -> None:
         # Update the toggle status in the toggle_status dictionary
         st.session_state['toggle_status'][movie.name] = toggle_status
 
-        if toggle_status:
+        # Only a change of the toggle is written to the database, in the background
+        if toggle_status and movie not in st.session_state['favs']:
             st.session_state['favs'].add(movie)
 
             if st.session_state['user'] != 'Guest':
-                username = st.session_state['user']
-                favourites = list({f.name for f in st.session_state['favs']})
-                conn= sql_db.connect_to_db()
-                cursor = conn.cursor()
-                query = "UPDATE users SET liked_movies = ? WHERE username = ?"
-                cursor.execute(query, (str(favourites), username))
-                cursor.commit()
-                cursor.close()
-
-                # db = firestore.client()
-                # doc_ref = db.collection("users").document(st.session_state['user'])
-                # doc_ref.set(
-                #     {"username": st.session_state['user'], "favourites": {f.name for f in st.session_state['favs']}})
-
-        elif movie in st.session_state['favs']:
+                repository.add_favourite(st.session_state['user'], movie.name)
+
+        elif not toggle_status and movie in st.session_state['favs']:
             st.session_state['favs'].discard(movie)
 
             if st.session_state['user'] != 'Guest':
-                username = st.session_state['user']
-                favourites = list({f.name for f in st.session_state['favs']})
-                conn = sql_db.connect_to_db()
-                cursor = conn.cursor()
-                query = "UPDATE users SET liked_movies = ? WHERE username = ?"
-                cursor.execute(query, (str(favourites), username))
-                cursor.commit()
-                cursor.close()
-
-
-                # db = firestore.client()
-                # doc_ref = db.collection("users").document(st.session_state['user'])
-                # doc_ref.set(
-                #     {"username": st.session_state['user'], "favourites": {f.name for f in st.session_state['favs']}})
+                repository.remove_favourite(st.session_state['user'], movie.name)
 
         st.divider()
 
@@ -0,0 +1,232 @@
+"""
+CSC111 Project 2: Nxt Movie
+
+Module Description
+==================
+Building blocks for streaming pipelines, such as the scraper's. Each stage of a pipeline is a generator consuming the
+items of the previous stage. Stages can run in their own thread, connected by bounded queues, and the final stage
+writes items in batches while recording its progress in a checkpoint file, so an interrupted run can be resumed.
+CPU-bound stages, such as parsing, can be spread over a pool of processes.
+
+Copyright and Usage Information
+===============================
+
+The file is expressly provided for the purposes of course assessments for CSC111 at the University of Toronto.
+All forms of distribution of this code, whether as given or with any changes, are expressly prohibited.
+
+© 2024 Umair Arham, Abdallah Arham Wajid Mohammed, Sameer Shahed, All Rights Reserved
+"""
+
+from __future__ import annotations
+import collections
+import json
+import os
+import queue
+import threading
+from concurrent.futures import Executor
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+# The default number of items buffered between two stages
+QUEUE_SIZE = 4
+
+# The default number of rows written at once
+FLUSH_ROWS = 500
+
+# The default number of items sent to a worker process at once
+CHUNK_SIZE = 1
+
+
+class Checkpoint:
+    """
+    The progress of a pipeline over numbered pages, saved to a json file. A page is completed once every row from it
+    and every page before it has been written.
+
+    Instance Attributes:
+        path:
+            The path of the checkpoint file.
+        key:
+            Identifies the job the checkpoint belongs to, such as the url being scraped. A checkpoint saved for a
+            different key is ignored.
+    """
+
+    path: str
+    key: str
+
+    def __init__(self, path: str, key: str) -> None:
+        self.path = path
+        self.key = key
+
+    def last_page(self) -> Optional[int]:
+        """
+        Return the last completed page, or None if no page of this job has been completed.
+        """
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        return saved.get('page') if saved.get('key') == self.key else None
+
+    def save(self, page: int) -> None:
+        """
+        Atomically record the given page as the last completed page.
+        """
+        tmp = self.path + '.tmp'
+
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'key': self.key, 'page': page}, f)
+
+        os.replace(tmp, self.path)
+
+    def clear(self) -> None:
+        """
+        Delete the checkpoint file, so the next run starts from the beginning.
+        """
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def threaded(stage: Iterable[Any], maxsize: int = QUEUE_SIZE) -> Iterator[Any]:
+    """
+    Run the given stage in a new thread, and yield its items through a queue holding at most maxsize items. The
+    stage is paused while the queue is full, so a slow consumer bounds the memory used by a fast producer.
+
+    If the stage raises an error, it is raised again here. If the consumer stops early, the stage is stopped the next
+    time it produces an item.
+    """
+    items = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce() -> None:
+        error = None
+        try:
+            for item in stage:
+                if not put(item):
+                    break
+        except BaseException as e:  # pylint: disable=broad-exception-caught
+            error = e
+        finally:
+            if hasattr(stage, 'close'):
+                stage.close()
+        put(_End(error))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item = items.get()
+            if isinstance(item, _End):
+                if item.error is not None:
+                    raise item.error
+                return
+            yield item
+
+    finally:
+        stop.set()
+        thread.join()
+
+
+def in_processes(function: Callable[[Any], Any], items: Iterable[Any], executor: Executor,
+                 chunk_size: int = CHUNK_SIZE, maxsize: int = QUEUE_SIZE) -> Iterator[Any]:
+    """
+    Yield function(item) for each of the given items, in order, computed by the processes of the given executor
+    (such as a ProcessPoolExecutor) chunk_size items at a time. At most maxsize chunks are submitted ahead of the
+    consumer, so a slow consumer bounds the memory used by the results. function must be a module level function, so
+    it can be sent to the processes.
+
+    Larger chunks spend less time sending tasks to the processes, but wait for more items before starting.
+    """
+    pending = collections.deque()
+    chunk = []
+
+    try:
+        for item in items:
+            chunk.append(item)
+
+            if len(chunk) >= chunk_size:
+                pending.append(executor.submit(_apply, function, chunk))
+                chunk = []
+
+            while len(pending) >= maxsize or (pending and pending[0].done()):
+                yield from pending.popleft().result()
+
+        if chunk:
+            pending.append(executor.submit(_apply, function, chunk))
+
+        while pending:
+            yield from pending.popleft().result()
+
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _apply(function: Callable[[Any], Any], chunk: list[Any]) -> list[Any]:
+    """
+    Return the result of function on every item of chunk. Run by the worker processes of in_processes.
+    """
+    return [function(item) for item in chunk]
+
+
+class _End:
+    """
+    Put on a queue by a stage thread once it has no more items, along with the error it raised, if any.
+    """
+    error: Optional[BaseException]
+
+    def __init__(self, error: Optional[BaseException]) -> None:
+        self.error = error
+
+
+def write_batches(pages: Iterable[tuple[int, list[Any]]], write: Callable[[list[Any]], Any],
+                  checkpoint: Optional[Checkpoint] = None, flush_rows: int = FLUSH_ROWS) -> int:
+    """
+    Consume pairs (page number, rows of that page) in increasing page order, passing the rows to write in batches of
+    at least flush_rows rows (except the last). After each batch is written, the last page it contains is saved as
+    completed to the given checkpoint. Return the number of rows written.
+    """
+    buffer = []
+    last_page = None
+    written = 0
+
+    def flush() -> None:
+        nonlocal buffer, written
+        if buffer:
+            write(buffer)
+            written += len(buffer)
+            buffer = []
+        if checkpoint is not None and last_page is not None:
+            checkpoint.save(last_page)
+
+    for page, rows in pages:
+        buffer.extend(rows)
+        last_page = page
+
+        if len(buffer) >= flush_rows:
+            flush()
+
+    flush()
+    return written
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['__future__', 'collections', 'json', 'os', 'queue', 'threading', 'concurrent.futures',
+                          'typing'],
+        'max-line-length': 120
+    })
@@ -14,108 +14,603 @@ All forms of distribution of this code, whether as given or with any changes, ar
 © 2024 Umair Arham, Abdallah Arham Wajid Mohammed, Sameer Shahed, All Rights Reserved
 """
 
+from __future__ import annotations
+from typing import Iterable, Optional
+import numpy as np
 import pandas as pd
+from scipy import sparse
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import networkx as nx
+from sklearn.preprocessing import normalize
 import trees
 from trees import Movie
 
+# The number of most similar movies stored for every movie in a NeighbourIndex
+DEFAULT_NEIGHBOURS = 20
 
-def create_data_frame(df: pd.DataFrame) -> pd.DataFrame:
+# The number of bytes the rows of a similarity matrix computed at once may take, including the copies top_k_columns
+# makes of them. The number of rows is chosen from this budget and the number of columns, so that the memory used
+# stays the same however large the catalogue is.
+MEMORY_BUDGET = 256 * 2 ** 20
+
+# The number of bytes taken by each column of a row of similarities: the float64 similarity, and the negated copy and
+# int64 index that top_k_columns makes of it
+BYTES_PER_COLUMN = 3 * 8
+
+# The number of most similar movies of each favourite that recommendation_engine ranks
+SIMILAR_MOVIES = 7
+
+# The vocabulary drift of a NeighbourIndex above which update_neighbour_index refits the TF-IDF vectorizer
+DRIFT_THRESHOLD = 0.02
+
+
+class NeighbourIndex:
+    """
+    A nearest neighbour index over the content similarity of every movie in the catalogue. Only the K most similar
+    movies of each movie are kept, so the index grows linearly with the catalogue instead of quadratically.
+
+    Instance Attributes:
+        titles:
+            The movie titles, in the order of the rows of the index.
+        positions:
+            A mapping from each movie title to its row in the index.
+        neighbours:
+            An (N, K) int32 array. Row i holds the rows of the K movies most similar to movie i, most similar first.
+        scores:
+            An (N, K) float32 array holding the cosine similarity of each entry in neighbours.
+        vectorizer:
+            The TF-IDF vectorizer fitted on the catalogue.
+        matrix:
+            The sparse TF-IDF matrix of the catalogue, one row per movie.
+        drift:
+            The average fraction of the words of each movie missing from the vectorizer's vocabulary. It is 0 when
+            the vectorizer was fitted on the catalogue, and grows as update_neighbour_index adds movies with new
+            words.
+        backend:
+            The SimilarityBackend that found the neighbours, which update_neighbour_index uses again, or None if it
+            is not known.
+
+    Representation Invariants:
+        - len(self.titles) == self.neighbours.shape[0] == self.scores.shape[0]
+        - self.neighbours.shape == self.scores.shape
     """
-    Takes in a pandas data dataframe containing columns of movies and their attributes. In the output dataframe, the
-    left most column will contain all the movie names. For each movie in the input dataframe, it calculates the cosine
-    similarity with every other movie based on genres, rating, and description, and stores the corresponding values
-    under a new column titled by the movie name.
+
+    titles: list[str]
+    positions: dict[str, int]
+    neighbours: np.ndarray
+    scores: np.ndarray
+    vectorizer: Optional[TfidfVectorizer]
+    matrix: Optional[sparse.csr_matrix]
+    drift: float
+    backend: Optional[SimilarityBackend]
+
+    def __init__(self, titles: list[str], neighbours: np.ndarray, scores: np.ndarray,
+                 vectorizer: Optional[TfidfVectorizer] = None, matrix: Optional[sparse.csr_matrix] = None,
+                 drift: float = 0.0, backend: Optional[SimilarityBackend] = None) -> None:
+        self.titles = titles
+        self.positions = {}
+        for i, title in enumerate(titles):
+            self.positions.setdefault(title, i)
+        self.neighbours = neighbours
+        self.scores = scores
+        self.vectorizer = vectorizer
+        self.matrix = matrix
+        self.drift = drift
+        self.backend = backend
+
+    def similar(self, movie_name: str, limit: int) -> list[str]:
+        """
+        Return the names of the (at most) limit movies most similar to the given movie, most similar first.
+        """
+        row = self.positions[movie_name]
+        return [self.titles[j] for j in self.neighbours[row, :limit]]
+
+    def rows_of(self, movie_names: Iterable[str]) -> np.ndarray:
+        """
+        Return the rows of the given movies in the index, skipping movies that are not in it.
+        """
+        return np.array([self.positions[name] for name in movie_names if name in self.positions], dtype=np.int64)
+
+    def similar_to_many(self, rows: np.ndarray, limit: int) -> np.ndarray:
+        """
+        Return the rows of the (at most) limit movies most similar to each of the movies at the given rows, excluding
+        those movies themselves. Movies similar to several of them are only returned once, and are ordered by their
+        highest similarity to any of them, most similar first.
+
+        The stored neighbours of all the given movies are selected from together, in O(len(rows) * K) time.
+        """
+        rows = np.unique(rows)
+        limit = min(limit, self.neighbours.shape[1])
+
+        if len(rows) == 0 or limit <= 0:
+            return np.empty(0, dtype=np.int64)
+
+        excluded = np.zeros(len(self.titles), dtype=bool)
+        excluded[rows] = True
+        neighbours = self.neighbours[rows]
+        scores = np.where(excluded[neighbours], -np.inf, self.scores[rows])
+
+        if limit < neighbours.shape[1]:
+            top = np.argpartition(-scores, limit - 1, axis=1)[:, :limit]
+            neighbours = np.take_along_axis(neighbours, top, axis=1)
+            scores = np.take_along_axis(scores, top, axis=1)
+
+        candidates, scores = neighbours.ravel(), scores.ravel()
+        found = scores > -np.inf
+        candidates, scores = candidates[found], scores[found]
+
+        # Sorted by score, the first occurrence of each candidate that np.unique finds is its highest score
+        candidates = candidates[np.lexsort((candidates, -scores))]
+        _, first = np.unique(candidates, return_index=True)
+
+        return candidates[np.sort(first)].astype(np.int64)
+
+
+class SimilarityBackend:
+    """
+    Finds the most similar movies of every movie from the TF-IDF matrix of the catalogue, for
+    create_neighbour_index. Subclasses trade the accuracy of the neighbours for the time taken to find them.
+    """
+
+    def top_k(self, matrix: sparse.csr_matrix, k: int,
+              chunk_size: Optional[int] = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Return the rows of the k rows of the given matrix with the highest cosine similarity to every row, most
+        similar first, along with their similarities, as an (N, k) int32 array and an (N, k) float32 array.
+        """
+        raise NotImplementedError
+
+    def tfidf_scores(self) -> bool:
+        """
+        Return whether the scores returned by top_k are the cosine similarities of the TF-IDF vectors, so that
+        update_neighbour_index can keep them and compare the changed movies against them. By default, they are.
+        """
+        return True
+
+
+class ExactBackend(SimilarityBackend):
+    """
+    Compares every movie with every other movie, computing chunk_size rows of the similarity matrix at a time.
+    """
+
+    def top_k(self, matrix: sparse.csr_matrix, k: int,
+              chunk_size: Optional[int] = None) -> tuple[np.ndarray, np.ndarray]:
+        return top_k_neighbours(matrix, k, chunk_size)
+
+
+def combined_text(df: pd.DataFrame) -> pd.Series:
+    """
+    Return the text used to compare movies by content: their genres, rating and description.
+    """
+    return df['genres'] + ' ' + df['rating'] + ' ' + df['description']
+
+
+def create_neighbour_index(df: pd.DataFrame, k: int = DEFAULT_NEIGHBOURS, chunk_size: Optional[int] = None,
+                           backend: Optional[SimilarityBackend] = None) -> NeighbourIndex:
     """
+    Takes in a pandas dataframe containing columns of movies and their attributes, and builds a NeighbourIndex
+    holding the k most similar movies of every movie. Similarity is the cosine similarity between the TF-IDF vectors
+    of the movies' genres, rating and description.
 
-    df['Combined_Text'] = df['genres'] + ' ' + df['rating'] + ' ' + df['description']
+    The neighbours are found by the given backend, by default an ExactBackend, which computes the similarities
+    chunk_size rows at a time, so at most chunk_size * N scores are in memory at once. By default, chunk_size is
+    chosen by chunk_rows to fit in MEMORY_BUDGET.
+    """
+    backend = backend if backend is not None else ExactBackend()
     vectorizer = TfidfVectorizer()
-    vectorized = vectorizer.fit_transform(df['Combined_Text'])
-    similarities = cosine_similarity(vectorized)
-    df2 = pd.DataFrame(similarities, columns=df['title'], index=df['title']).reset_index()
+    matrix = vectorizer.fit_transform(combined_text(df))
+    neighbours, scores = backend.top_k(matrix, k, chunk_size)
 
-    return df2
+    return NeighbourIndex(df['title'].tolist(), neighbours, scores, vectorizer, matrix, backend=backend)
 
 
-def get_similar_movies(movie_name: str, dataframe: pd.DataFrame) -> list[str]:
+def update_neighbour_index(index: NeighbourIndex, old_df: pd.DataFrame, df: pd.DataFrame,
+                           k: int = DEFAULT_NEIGHBOURS, chunk_size: Optional[int] = None,
+                           drift_threshold: float = DRIFT_THRESHOLD,
+                           backend: Optional[SimilarityBackend] = None) -> NeighbourIndex:
+    """
+    Return a NeighbourIndex of the movies in df, updated from the given index of the movies in old_df, in time
+    proportional to the number of changed movies rather than to the size of the catalogue squared.
+
+    Movies are matched by title. Movies that are new or whose genres, rating or description changed are vectorized
+    with the index's vocabulary. Their rows are recomputed, along with the rows of the movies that had a changed or
+    removed movie among their neighbours. Every other row keeps its neighbours, only comparing them against the
+    changed movies.
+
+    The index is rebuilt from scratch by the given backend, by default the one that built it, with a newly fitted
+    vectorizer, instead if it has no vectorizer, if it holds fewer than k neighbours per movie while df has more
+    movies, or if its drift would exceed drift_threshold. It is also rebuilt if the scores of either backend are not
+    TF-IDF cosine similarities (such as those of embeddings.EmbeddingBackend), or if the backend that built it is
+    not known, as the kept and recomputed scores would not be comparable.
     """
-    Given a movie name and a pandas dataframe with the layout described for the return value of create_data_frame,
-    return a list of recommended movie names based on the highest cosine similarity with the given movie.
+    n = len(df)
+    texts = combined_text(df).tolist()
+    backend = backend if backend is not None else index.backend
+
+    if index.vectorizer is None or index.matrix is None or index.neighbours.shape[1] < min(k, n) \
+            or index.backend is None or not index.backend.tfidf_scores() or not backend.tfidf_scores():
+        return create_neighbour_index(df, k, chunk_size, backend)
+
+    # source[i] is the row in the old index of movie i, or -1 if it is new or changed
+    old_texts = combined_text(old_df).tolist()
+    old_rows = {}
+    for j, title in enumerate(old_df['title']):
+        old_rows.setdefault(title, j)
+
+    source = np.full(n, -1, dtype=np.int64)
+    seen = set()
+    for i, title in enumerate(df['title']):
+        j = old_rows.get(title)
+        if j is not None and title not in seen and old_texts[j] == texts[i]:
+            source[i] = j
+        seen.add(title)
+
+    dirty = np.flatnonzero(source < 0)
+    kept = np.flatnonzero(source >= 0)
+
+    analyzer = index.vectorizer.build_analyzer()
+    vocabulary = index.vectorizer.vocabulary_
+    unknown = 0.0
+    for i in dirty:
+        words = analyzer(texts[i])
+        unknown += sum(word not in vocabulary for word in words) / len(words) if words else 0.0
+
+    drift = (index.drift * len(old_df) + unknown) / max(n, 1)
+    if drift > drift_threshold:
+        return create_neighbour_index(df, k, chunk_size, backend)
+
+    order = source.copy()
+    order[dirty] = index.matrix.shape[0] + np.arange(len(dirty))
+    stacked = sparse.csr_matrix(index.matrix)
+    if len(dirty) > 0:
+        stacked = sparse.vstack([stacked, index.vectorizer.transform([texts[i] for i in dirty])], format='csr')
+    matrix = stacked[order]
+
+    k = min(index.neighbours.shape[1], n)
+    new_rows = np.full(index.matrix.shape[0], -1, dtype=np.int64)
+    new_rows[source[kept]] = kept
+    remapped = new_rows[index.neighbours[source[kept], :k]]
+    old_scores = index.scores[source[kept], :k]
+
+    invalid = (remapped < 0).any(axis=1)
+    recompute = np.union1d(dirty, kept[invalid])
+    valid = kept[~invalid]
+    remapped, old_scores = remapped[~invalid], old_scores[~invalid]
+
+    neighbours = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=np.float32)
+    neighbours[recompute], scores[recompute] = top_k_neighbours(matrix, k, chunk_size, rows=recompute)
+
+    if len(dirty) == 0:
+        neighbours[valid], scores[valid] = remapped, old_scores
+    else:
+        normalized = normalize(matrix)
+        dirty_columns = normalized[dirty].T.tocsr()
+
+        chunk_size = chunk_rows(k + len(dirty), chunk_size)
+        for start in range(0, len(valid), chunk_size):
+            rows = valid[start:start + chunk_size]
+            block = (normalized[rows] @ dirty_columns).toarray().astype(np.float32)
+            columns = np.hstack([remapped[start:start + chunk_size], np.broadcast_to(dirty, block.shape)])
+            values = np.hstack([old_scores[start:start + chunk_size], block])
+            top = np.lexsort((columns, -values), axis=-1)[:, :k]
+            neighbours[rows] = np.take_along_axis(columns, top, axis=1)
+            scores[rows] = np.take_along_axis(values, top, axis=1)
+
+    return NeighbourIndex(df['title'].tolist(), neighbours, scores, index.vectorizer, matrix, drift, backend)
+
+
+def top_k_neighbours(matrix: sparse.csr_matrix, k: int, chunk_size: Optional[int] = None,
+                     rows: Optional[np.ndarray] = None) -> tuple[np.ndarray, np.ndarray]:
     """
+    Return the rows of the k most similar rows of the given matrix for every row, along with their cosine
+    similarities, as an (N, k) int32 array and an (N, k) float32 array.
 
-    # Get all the similarity scores corresponding to our target movie (movie_name)
-    sim_scores_list = dataframe[movie_name].values.tolist()
+    If rows is given, only the neighbours of those rows are returned, in the same order.
+    """
+    normalized = normalize(matrix)
+    transposed = normalized.T.tocsr()
+    n = matrix.shape[0] if rows is None else len(rows)
+    k = min(k, matrix.shape[0])
+    chunk_size = chunk_rows(matrix.shape[0], chunk_size)
 
-    # Extract the names of all the titles the movie is being compared against, and remove the movie itself
-    titles_list = dataframe['title'].tolist()
+    neighbours = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=np.float32)
 
-    # Create a dictionary mapping titles to similarity scores
-    mapping = dict(zip(titles_list, sim_scores_list))
+    for start in range(0, n, chunk_size):
+        chunk = normalized[start:start + chunk_size] if rows is None else normalized[rows[start:start + chunk_size]]
+        block = (chunk @ transposed).toarray()
+        top = top_k_columns(block, k)
+        neighbours[start:start + block.shape[0]] = top
+        scores[start:start + block.shape[0]] = np.take_along_axis(block, top, axis=1)
 
-    # Sort by highest cosine similarity scores
-    sorted_mapping = sorted(mapping.items(), key=lambda x: x[1], reverse=True)
+    return neighbours, scores
 
-    return [s[0] for s in sorted_mapping if s != movie_name][:7]
 
+def chunk_rows(columns: int, chunk_size: Optional[int] = None) -> int:
+    """
+    Return the number of rows of similarities against the given number of columns to compute at once: chunk_size if
+    it is given, or else as many rows as fit in MEMORY_BUDGET.
+    """
+    if chunk_size is not None:
+        return chunk_size
 
-def recommendation_engine(favs: list[Movie], dataframe: pd.DataFrame, all_movies: list[Movie]) -> list[str]:
+    return max(1, MEMORY_BUDGET // (BYTES_PER_COLUMN * max(columns, 1)))
+
+
+def top_k_columns(block: np.ndarray, k: int) -> np.ndarray:
+    """
+    Return the columns of the k largest values in every row of block, largest first. Ties are broken by the lower
+    column, which gives the same order as a stable descending sort of the whole row.
+    """
+    if k < block.shape[1]:
+        candidates = np.argpartition(-block, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.tile(np.arange(block.shape[1]), (block.shape[0], 1))
+
+    values = np.take_along_axis(block, candidates, axis=1)
+    top = np.take_along_axis(candidates, np.lexsort((candidates, -values), axis=-1), axis=1)
+
+    # argpartition chooses arbitrarily between values tied with the k-th largest, so redo those rows exactly
+    kth = np.take_along_axis(block, top[:, -1:], axis=1)
+    for i in np.flatnonzero((block >= kth).sum(axis=1) > k):
+        cols = np.flatnonzero(block[i] >= kth[i, 0])
+        top[i] = cols[np.lexsort((cols, -block[i, cols]))][:k]
+
+    return top
+
+
+def get_similar_movies(movie_name: str, index: NeighbourIndex) -> list[str]:
+    """
+    Given a movie name and a NeighbourIndex of the catalogue, return a list of recommended movie names based on the
+    highest cosine similarity with the given movie.
+    """
+    return index.similar(movie_name, SIMILAR_MOVIES)
+
+
+def recommendation_engine(favs: list[Movie], index: NeighbourIndex,
+                          all_movies: list[Movie] | trees.TitleIndex) -> list[str]:
     """
     Takes in a list of movie objects that the user has favourited, the list of all possible movie objects from the
-    given dataset, and a pandas dataframe with the layout described for the return value of create_data_frame.
+    given dataset, and the NeighbourIndex of the dataset.
 
-    For each movie in favs, it creates a list of similar movies from given dataframe whose Movie objects are
-    then added to a weighted graph as nodes.
+    The SIMILAR_MOVIES movies most similar to each movie in favs, other than the movies in favs, are looked up
+    together in the given index, and their Movie objects are then added to a weighted graph as nodes.
 
     The weights between every pair of movies are calculated using the algorithm implmented in
     calculate_similarity. The Pagerank algorithm is then used to calculate the importance of each movie based on the
     weights of all its edges. A list of names of movies with the highest importance are returned.
     """
 
-    graph = nx.Graph()
-    movie_obj = []
-
-    for movie in favs:
-        curr = get_similar_movies(movie.name, dataframe)
-        curr = trees.convert_to_movie_obj(curr, all_movies)
-        movie_obj.extend(curr)
-
-    for movie1 in movie_obj:
-        for movie2 in movie_obj:
-            if movie1 != movie2:
-                similarity = calculate_similarity(movie1, movie2)
-                graph.add_edge(movie1.name, movie2.name, weight=similarity)
+    similar = index.similar_to_many(index.rows_of(movie.name for movie in favs), SIMILAR_MOVIES)
+    movie_obj = trees.convert_to_movie_obj([index.titles[i] for i in similar], all_movies)
 
-    pagerank_scores = nx.pagerank(graph)
-    ranked_movies = sorted(pagerank_scores.items(), key=lambda x: x[1], reverse=True)
-    top_matches = [mov[0] for mov in ranked_movies[:20]]  # Select top matches
+    return rank_movies(movie_obj)
 
-    return top_matches
 
-
-def recommendation_engine_filters(filtered_movies: list[trees.Movie]) -> list[str]:
+def recommendation_engine_filters(filtered_movies: list[trees.Movie], neighbours: Optional[int] = None,
+                                  max_candidates: Optional[int] = None) -> list[str]:
     """
     Find the top matching movies based on the user's filters. An edge is created
     between every filtered movie, and the calculate similarity function is used to compute
     their edge weights. The Pagerank algorithm is then used to identify the most centralized vertices,
     and the list of top movies according to Pagerank are then returned.
+
+    Broad filters can match thousands of movies, making the complete graph very large. If neighbours is given, each
+    movie is only joined to its neighbours most similar movies instead. If max_candidates is given, only that many of
+    the highest scoring movies are ranked. pruning_overlap measures how much either option changes the result.
+
+    Both options are off by default, so the complete graph is ranked. Only max_candidates saves time, since
+    knn_similarity_graph still scores every pair of movies, and both change which movies are recommended.
+    """
+    return rank_movies(filtered_movies, neighbours=neighbours, max_candidates=max_candidates)
+
+
+def rank_movies(movies: list[Movie], limit: int = 20, personalization: Optional[dict[str, float]] = None,
+                nstart: Optional[dict[str, float]] = None, neighbours: Optional[int] = None,
+                max_candidates: Optional[int] = None) -> list[str]:
+    """
+    Return the names of the (at most) limit most important of the given movies. Every pair of movies is joined by an
+    edge weighted by calculate_similarity, and the importance of each movie is its Pagerank in the resulting graph.
+    Movies sharing a name are only counted once.
+
+    personalization and nstart optionally map movie names to their teleport weight and starting score, as described
+    in pagerank. Movies missing from them get a weight of 0.
+
+    If neighbours is given, the graph is pruned to the k-nearest neighbour graph built by knn_similarity_graph, which
+    holds O(N * k) edges instead of O(N^2) but takes as long to build as the complete graph. If max_candidates is
+    given, only that many of the highest scoring movies are ranked, which is faster but ignores the other movies.
+    """
+    by_name = {}
+    for movie in movies:
+        by_name.setdefault(movie.name, movie)
+    unique = list(by_name.values())
+
+    if max_candidates is not None and len(unique) > max_candidates:
+        unique = sorted(unique, key=lambda m: m.score, reverse=True)[:max_candidates]
+
+    if len(unique) < 2:  # No edges can be made, so the graph is empty
+        return []
+
+    if personalization is not None:
+        personalization = np.array([personalization.get(movie.name, 0) for movie in unique], dtype=np.float64)
+    if nstart is not None:
+        nstart = np.array([nstart.get(movie.name, 0) for movie in unique], dtype=np.float64)
+
+    if neighbours is None:
+        weights = similarity_matrix(unique)
+    else:
+        weights = knn_similarity_graph(unique, neighbours)
+
+    pagerank_scores = pagerank(weights, personalization=personalization, nstart=nstart)
+    ranked_movies = sorted(enumerate(pagerank_scores), key=lambda x: x[1], reverse=True)
+
+    return [unique[i].name for i, _ in ranked_movies[:limit]]
+
+
+def pruning_overlap(movies: list[Movie], neighbours: Optional[int] = None, max_candidates: Optional[int] = None,
+                    limit: int = 20) -> float:
+    """
+    Return the fraction of the top limit movies ranked over the complete graph of the given movies that are also in
+    the top limit when ranked with the given neighbours and max_candidates pruning. 1.0 means pruning did not
+    change which movies are recommended.
+    """
+    exact = rank_movies(movies, limit)
+    pruned = rank_movies(movies, limit, neighbours=neighbours, max_candidates=max_candidates)
+
+    return len(set(exact) & set(pruned)) / len(exact) if exact else 1.0
+
+
+def pagerank(weights: np.ndarray | sparse.spmatrix | sparse.sparray, alpha: float = 0.85,
+             personalization: Optional[np.ndarray] = None, max_iter: int = 100, tol: float = 1.0e-6,
+             nstart: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Return the Pagerank of every vertex of the graph with the given (N, N) weight matrix, where entry [i, j] is the
+    weight of the edge from vertex i to vertex j, and 0 means there is no edge. The result is the same as
+    networkx.pagerank on that graph.
+
+    The scores are computed by power iteration, which stops once the total change in the scores over one iteration
+    is below N * tol. A RuntimeError is raised if that does not happen within max_iter iterations.
+
+    personalization gives the relative chance of teleporting to each vertex (uniform by default), and is also used
+    for the edges of vertices without any outgoing weight. nstart is the initial score of each vertex (uniform by
+    default); passing the scores of a previous, similar graph makes the iteration converge sooner.
+
+    Preconditions:
+        - weights.shape[0] == weights.shape[1]
+        - (weights >= 0).all()
+        - personalization is None or (personalization.sum() > 0 and len(personalization) == weights.shape[0])
+        - nstart is None or (nstart.sum() > 0 and len(nstart) == weights.shape[0])
+    """
+    n = weights.shape[0]
+    if n == 0:
+        return np.zeros(0)
+
+    out_weight = np.asarray(weights.sum(axis=1)).ravel()
+    inverse = np.zeros(n)
+    inverse[out_weight != 0] = 1.0 / out_weight[out_weight != 0]
+
+    # Scale each row to sum to 1, so that the matrix holds the transition probabilities
+    if sparse.issparse(weights):
+        transitions = sparse.csr_array(sparse.diags_array(inverse) @ weights)
+    else:
+        transitions = weights * inverse[:, None]
+
+    x = np.repeat(1.0 / n, n) if nstart is None else nstart / nstart.sum()
+    p = np.repeat(1.0 / n, n) if personalization is None else personalization / personalization.sum()
+    dangling = np.flatnonzero(out_weight == 0)
+
+    for _ in range(max_iter):
+        last = x
+        x = alpha * (x @ transitions + x[dangling].sum() * p) + (1 - alpha) * p
+
+        if np.abs(x - last).sum() < n * tol:
+            return x
+
+    raise RuntimeError(f'Pagerank failed to converge within {max_iter} iterations')
+
+
+class MovieFeatures:
+    """
+    The attributes of a list of movies used by calculate_similarity, stored as arrays so that the similarity between
+    many pairs of movies can be computed at once.
+
+    Instance Attributes:
+        genres:
+            An (N, G) array where entry [i, g] is 1 if movie i has genre g, and 0 otherwise.
+        genre_counts:
+            The number of distinct genres of each movie.
+        scores:
+            The average score of each movie.
+        ratings:
+            An integer code for the pg-rating of each movie. Movies have the same code iff they have the same rating.
+        years:
+            The release year of each movie.
+    """
+
+    genres: np.ndarray
+    genre_counts: np.ndarray
+    scores: np.ndarray
+    ratings: np.ndarray
+    years: np.ndarray
+
+    def __init__(self, movies: list[Movie]) -> None:
+        genre_codes, rating_codes = {}, {}
+        rows, cols = [], []
+
+        for i, movie in enumerate(movies):
+            for genre in set(movie.genre):
+                rows.append(i)
+                cols.append(genre_codes.setdefault(genre, len(genre_codes)))
+
+        # Counts are small integers, so storing them as floats keeps the products exact while using BLAS
+        self.genres = np.zeros((len(movies), len(genre_codes)), dtype=np.float64)
+        self.genres[rows, cols] = 1
+        self.genre_counts = self.genres.sum(axis=1)
+        self.scores = np.array([movie.score for movie in movies], dtype=np.float64)
+        self.ratings = np.array([rating_codes.setdefault(movie.rating, len(rating_codes)) for movie in movies])
+        self.years = np.array([movie.rel for movie in movies], dtype=np.float64)
+
+    def similarity_rows(self, rows: np.ndarray | slice) -> np.ndarray:
+        """
+        Return the similarity between the movies at the given rows and every movie, as computed by
+        calculate_similarity. Entry [r, j] is the similarity between movie rows[r] and movie j.
+        """
+        intersection = self.genres[rows] @ self.genres.T
+        union = self.genre_counts[rows, None] + self.genre_counts[None, :] - intersection
+        jaccard = np.divide(intersection, union, out=np.zeros_like(intersection), where=union != 0)
+
+        average_score = (self.scores[rows, None] + self.scores[None, :]) / 2
+        rating = (self.ratings[rows, None] == self.ratings[None, :]).astype(np.float64)
+        date_similarity = np.abs(self.years[rows, None] - self.years[None, :]) / 100
+
+        return np.abs((jaccard * average_score) + rating - date_similarity)
+
+
+def similarity_matrix(movies: list[Movie]) -> np.ndarray:
+    """
+    Return the (N, N) matrix of the similarity between every pair of the given movies. Entry [i, j] is equal to
+    calculate_similarity(movies[i], movies[j]) for i != j, and the diagonal is 0.
+    """
+    weights = MovieFeatures(movies).similarity_rows(slice(None))
+    np.fill_diagonal(weights, 0)
+
+    return weights
+
+
+def knn_similarity_graph(movies: list[Movie], k: int, chunk_size: Optional[int] = None) -> sparse.csr_array:
+    """
+    Return the sparse weight matrix of the k-nearest neighbour graph of the given movies. Each movie is joined to
+    the k other movies it is most similar to according to calculate_similarity, and an edge is kept if either of its
+    movies chose the other, so the matrix is symmetric.
+
+    The similarities are computed chunk_size rows at a time (by default, as many as fit in MEMORY_BUDGET), so the
+    complete matrix is never held in memory. Every pair of movies is still scored, so this saves memory but not
+    time over similarity_matrix. Pruning the graph also changes the Pagerank of its movies a lot: on generated
+    catalogues, less than a third of the top 20 of the complete graph stays in the top 20.
+
+    Preconditions:
+        - k >= 1
+        - len(movies) >= 2
     """
+    n = len(movies)
+    k = min(k, n - 1)
+    features = MovieFeatures(movies)
+    rows, cols, values = [], [], []
+    chunk_size = chunk_rows(n, chunk_size)
 
-    graph = nx.Graph()
+    for start in range(0, n, chunk_size):
+        block = features.similarity_rows(slice(start, start + chunk_size))
+        own = np.arange(block.shape[0])
+        block[own, own + start] = -np.inf  # A movie is not its own neighbour
 
-    for m1 in filtered_movies:
-        for m2 in filtered_movies:
-            if m1 != m2:
-                similarity = calculate_similarity(m1, m2)
-                graph.add_edge(m1.name, m2.name, weight=similarity)
+        top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        rows.append(np.repeat(own + start, k))
+        cols.append(top.ravel())
+        values.append(np.take_along_axis(block, top, axis=1).ravel())
 
-    # Run PageRank algorithm
-    pagerank_scores = nx.pagerank(graph)
-    ranked_movies = sorted(pagerank_scores.items(), key=lambda x: x[1], reverse=True)
-    top_matches = [movie[0] for movie in ranked_movies[:20]]
+    weights = sparse.csr_array((np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))), shape=(n, n))
 
-    return top_matches
+    return weights.maximum(weights.T)
 
 
 def calculate_similarity(movie1: Movie, movie2: Movie) -> int | float:
@@ -144,7 +639,7 @@ def calculate_similarity(movie1: Movie, movie2: Movie) -> int | float:
 #     import python_ta
 #
 #     python_ta.check_all(config={
-#         'extra-imports': ['pandas',
-#                           'sklearn.metrics.pairwise', 'sklearn.feature_extraction.text', 'trees', 'networkx'],
+#         'extra-imports': ['__future__', 'typing', 'numpy', 'pandas', 'scipy', 'sklearn.preprocessing',
+#                           'sklearn.feature_extraction.text', 'trees'],
 #         'max-line-length': 120
 #     })
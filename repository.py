@@ -0,0 +1,379 @@
+"""
+CSC111 Project 2: Nxt Movie
+
+Module Description
+==================
+Every query the app runs against the database, grouped into users, favourites and movies. All of them check a
+connection out of a single ConnectionPool shared by the process, so callers never open or close connections
+themselves.
+
+Copyright and Usage Information
+===============================
+
+The file is expressly provided for the purposes of course assessments for CSC111 at the University of Toronto.
+All forms of distribution of this code, whether as given or with any changes, are expressly prohibited.
+
+© 2024 Umair Arham, Abdallah Arham Wajid Mohammed, Sameer Shahed, All Rights Reserved
+"""
+
+from __future__ import annotations
+import ast
+import atexit
+import threading
+from typing import Any, Callable, ContextManager, Optional
+import pandas as pd
+import sql_db
+from db_pool import ConnectionPool
+
+# The default bounds on the number of connections the process keeps open
+POOL_MIN = 1
+POOL_MAX = 10
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def configure(connect: Callable[[], Any], **options: Any) -> ConnectionPool:
+    """
+    Replace the process's pool with a new one opening connections with connect, such as sql_db.connect_to_sqlite
+    when testing offline. The options are passed on to ConnectionPool. Return the new pool.
+    """
+    global _pool
+
+    with _pool_lock:
+        old, _pool = _pool, ConnectionPool(connect, **{'min_size': POOL_MIN, 'max_size': POOL_MAX, **options})
+
+    if old is not None:
+        old.close()
+
+    return _pool
+
+
+def get_pool() -> ConnectionPool:
+    """
+    Return the process's pool, creating one connecting to the Azure SQL Database on first use.
+    """
+    global _pool
+
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(sql_db.connect_to_db, POOL_MIN, POOL_MAX)
+
+    return _pool
+
+
+def connection() -> ContextManager[Any]:
+    """
+    Check a connection out of the process's pool for the duration of a with block.
+    """
+    return get_pool().connection()
+
+
+def pool_stats() -> dict[str, float]:
+    """
+    Return the metrics of the process's pool, as described in ConnectionPool.stats.
+    """
+    return get_pool().stats()
+
+
+def _fetch_one(query: str, params: tuple) -> Optional[tuple]:
+    """
+    Run a query with the given parameters and return its first row, or None if it has none.
+    """
+    with connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query, params)
+            return cursor.fetchone()
+        finally:
+            cursor.close()
+
+
+def _execute(query: str, params: tuple) -> None:
+    """
+    Run a statement with the given parameters and commit it.
+    """
+    with connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query, params)
+        finally:
+            cursor.close()
+        conn.commit()
+
+
+# Users
+
+
+def email_exists(email: str) -> bool:
+    """
+    Return whether a user signed up with the given email.
+    """
+    return _fetch_one('SELECT email FROM users WHERE email = ?', (email,)) is not None
+
+
+def get_password(email: str) -> Optional[str]:
+    """
+    Return the password of the user with the given email, or None if there is no such user.
+    """
+    row = _fetch_one('SELECT password FROM users WHERE email = ?', (email,))
+    return row[0] if row is not None else None
+
+
+def get_username(email: str, password: str) -> Optional[str]:
+    """
+    Return the username of the user with the given email and password, or None if there is no such user.
+    """
+    row = _fetch_one('SELECT username FROM users WHERE email = ? AND password = ?', (email, password))
+    return row[0] if row is not None else None
+
+
+def create_user(username: str, email: str, password: str) -> None:
+    """
+    Add a new user with no favourites.
+    """
+    _execute('INSERT INTO users(username, email, password, liked_movies) VALUES (?, ?, ?, ?)',
+             (username, email, password, '[]'))
+
+
+# Favourites
+
+
+FAVOURITES_QUERY = ('SELECT m.title FROM user_favourites f JOIN users u ON u.id = f.user_id '
+                    'JOIN movies m ON m.id = f.movie_id WHERE u.username = ?')
+
+ADD_FAVOURITE = ('INSERT INTO user_favourites (user_id, movie_id) SELECT u.id, m.id FROM users u, movies m '
+                 'WHERE u.username = ? AND m.title = ? AND NOT EXISTS '
+                 '(SELECT 1 FROM user_favourites f WHERE f.user_id = u.id AND f.movie_id = m.id)')
+
+REMOVE_FAVOURITE = ('DELETE FROM user_favourites WHERE user_id IN (SELECT id FROM users WHERE username = ?) '
+                    'AND movie_id IN (SELECT id FROM movies WHERE title = ?)')
+
+# The number of seconds a change to a user's favourites may wait before it is written
+FLUSH_INTERVAL = 2.0
+
+# The number of unwritten changes at which they are written without waiting
+FLUSH_PENDING = 100
+
+
+class FavouritesWriter:
+    """
+    Writes changes to users' favourites behind the caller's back. Changes are buffered and written together, in one
+    transaction, by a background thread every flush_interval seconds, or as soon as max_pending changes are waiting.
+    A movie liked and then unliked before the next write only has its last state written.
+
+    Instance Attributes:
+        flush_interval:
+            The number of seconds a change may wait before it is written.
+        max_pending:
+            The number of unwritten changes at which they are written without waiting.
+    """
+    # Private Instance Attributes:
+    #   - _pending:
+    #       A mapping from each (username, movie name) changed since the last write to whether the movie is now
+    #       liked.
+    #   - _lock:
+    #       Held while reading or updating _pending.
+    #   - _flush_lock:
+    #       Held while writing, so that changes are written in the order they were made.
+    #   - _wake:
+    #       Set to make the background thread write immediately.
+    #   - _thread:
+    #       The background thread, or None if no change has been made yet.
+
+    flush_interval: float
+    max_pending: int
+    _pending: dict[tuple[str, str], bool]
+    _lock: threading.Lock
+    _flush_lock: threading.Lock
+    _wake: threading.Event
+    _thread: Optional[threading.Thread]
+
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL, max_pending: int = FLUSH_PENDING) -> None:
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def record(self, username: str, name: str, liked: bool) -> None:
+        """
+        Record that the given user now likes (or no longer likes) the movie with the given name.
+        """
+        with self._lock:
+            self._pending[(username, name)] = liked
+            full = len(self._pending) >= self.max_pending
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='favourites-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+        if full:
+            self._wake.set()
+
+    def flush(self) -> None:
+        """
+        Write every change recorded so far. If writing fails, the changes are kept to be retried, unless a newer
+        change to the same favourite was recorded in the meantime, and the error is raised.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+
+            if not batch:
+                return
+
+            adds = [key for key, liked in batch.items() if liked]
+            removes = [key for key, liked in batch.items() if not liked]
+
+            try:
+                with connection() as conn:
+                    cursor = conn.cursor()
+                    try:
+                        if adds:
+                            cursor.executemany(ADD_FAVOURITE, adds)
+                        if removes:
+                            cursor.executemany(REMOVE_FAVOURITE, removes)
+                    finally:
+                        cursor.close()
+                    conn.commit()
+
+            except Exception:
+                with self._lock:
+                    self._pending = {**batch, **self._pending}
+                raise
+
+    def _run(self) -> None:
+        """
+        Write the recorded changes every flush_interval seconds, or sooner when woken up.
+        """
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+
+            try:
+                self.flush()
+            except Exception as e:
+                print(f'Failed to write favourites. Error: {e}')
+
+
+_favourites_writer = FavouritesWriter()
+
+
+def get_favourites(username: str) -> list[str]:
+    """
+    Return the names of the movies the given user liked, including changes not written yet.
+    """
+    _favourites_writer.flush()
+
+    with connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(FAVOURITES_QUERY, (username,))
+            return list(dict.fromkeys(row[0] for row in cursor.fetchall()))
+        finally:
+            cursor.close()
+
+
+def add_favourite(username: str, name: str) -> None:
+    """
+    Record that the given user liked the movie with the given name. The change is written in the background.
+    """
+    _favourites_writer.record(username, name, True)
+
+
+def remove_favourite(username: str, name: str) -> None:
+    """
+    Record that the given user no longer likes the movie with the given name. The change is written in the
+    background.
+    """
+    _favourites_writer.record(username, name, False)
+
+
+def flush_favourites() -> None:
+    """
+    Write every change to favourites recorded so far.
+    """
+    _favourites_writer.flush()
+
+
+def migrate_liked_movies() -> int:
+    """
+    Copy the favourites stored as a list in the liked_movies column of every user into the user_favourites table,
+    and return the number of favourites copied. Favourites already in the table are skipped.
+    """
+    with connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute('SELECT username, liked_movies FROM users')
+            favourites = []
+
+            for username, liked_movies in cursor.fetchall():
+                try:
+                    favourites.extend((username, name) for name in ast.literal_eval(liked_movies))
+                except (TypeError, ValueError, SyntaxError):
+                    pass
+
+            if favourites:
+                cursor.executemany(ADD_FAVOURITE, favourites)
+        finally:
+            cursor.close()
+        conn.commit()
+
+    return len(favourites)
+
+
+# Movies
+
+
+def load_movies() -> pd.DataFrame:
+    """
+    Return every movie in the movies table, without its id.
+    """
+    with connection() as conn:
+        df = pd.read_sql('SELECT * FROM movies', conn)
+
+    df.drop(columns='id', inplace=True)
+    return df
+
+
+def load_fingerprints() -> dict[str, tuple]:
+    """
+    Return a mapping from the title of every movie in the movies table to its sql_db.card_fingerprint.
+    """
+    with connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute('SELECT title, metacritic, release, description FROM movies')
+            return {title: sql_db.card_fingerprint({'metacritic': metacritic, 'release': release,
+                                                    'description': description})
+                    for title, metacritic, release, description in cursor.fetchall()}
+        finally:
+            cursor.close()
+
+
+def save_movies(data: list[dict[str, Any]], upsert: bool = True) -> sql_db.LoadReport:
+    """
+    Write the given scraped movies with sql_db.bulk_load, updating the movies whose title is already in the table
+    if upsert is True, and return its LoadReport.
+    """
+    with connection() as conn:
+        report = sql_db.bulk_load(data, conn, upsert=upsert)
+
+    for title, reason in report.rejected:
+        print(f'Rejected {title}: {reason}')
+
+    return report
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['__future__', 'ast', 'atexit', 'threading', 'typing', 'pandas', 'sql_db', 'db_pool'],
+        'max-line-length': 120
+    })
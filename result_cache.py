@@ -0,0 +1,191 @@
+"""
+CSC111 Project 2: Nxt Movie
+
+Module Description
+==================
+A cache of the results of recommendation queries, shared by every session of the app. Streamlit reruns the whole
+script on every interaction, so the same favourites or filters are often asked for again, by the same user or by
+others. Results are keyed by a hash of the normalized query and the version of the catalogue that answered it, so a
+newer catalogue never serves results computed from an older one.
+
+Copyright and Usage Information
+===============================
+
+The file is expressly provided for the purposes of course assessments for CSC111 at the University of Toronto.
+All forms of distribution of this code, whether as given or with any changes, are expressly prohibited.
+
+© 2024 Umair Arham, Abdallah Arham Wajid Mohammed, Sameer Shahed, All Rights Reserved
+"""
+
+from __future__ import annotations
+import collections
+import hashlib
+import json
+import sys
+import threading
+import time
+from typing import Any, Callable, Hashable, TypeVar
+
+T = TypeVar('T')
+
+# The default maximum number of results kept
+MAX_ENTRIES = 1024
+
+# The default maximum approximate size of the results kept, in bytes
+MAX_BYTES = 32 * 2 ** 20
+
+# The default number of seconds a result is kept after it was computed
+TTL = 600.0
+
+
+class ResultCache:
+    """
+    A thread-safe cache of query results. The least recently used results are evicted once there are more than
+    max_entries of them or their approximate total size exceeds max_bytes, and results expire ttl seconds after
+    they were computed.
+
+    Results are returned as stored, so callers must not mutate them. If several threads miss on the same query at
+    once, each computes it.
+
+    Instance Attributes:
+        max_entries:
+            The maximum number of results kept.
+        max_bytes:
+            The maximum approximate size of the results kept, in bytes. Results larger than this are not kept.
+        ttl:
+            The number of seconds a result is kept after it was computed.
+    """
+    # Private Instance Attributes:
+    #   - _entries:
+    #       A mapping from the key of each cached query to the time its result expires, the approximate size of the
+    #       result and the result, least recently used first.
+    #   - _bytes:
+    #       The approximate total size of the cached results.
+    #   - _lock:
+    #       Held while reading or updating _entries, _bytes and _stats.
+    #   - _stats:
+    #       The counters reported by stats.
+
+    max_entries: int
+    max_bytes: int
+    ttl: float
+    _entries: collections.OrderedDict[str, tuple[float, int, Any]]
+    _bytes: int
+    _lock: threading.Lock
+    _stats: dict[str, int]
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES, ttl: float = TTL) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+    def get_or_compute(self, query: Any, version: Hashable, compute: Callable[[], T]) -> T:
+        """
+        Return the cached result of the given query against the given catalogue version, or compute it by calling
+        compute and cache it. The query must be serializable to json once normalized, with lists in a canonical
+        order, such as by normalize_filters.
+        """
+        key = cache_key(query, version)
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry[2]
+
+            if entry is not None:
+                self._remove(key)
+                self._stats['expirations'] += 1
+
+            self._stats['misses'] += 1
+
+        result = compute()
+        size = approximate_size(result)
+
+        if size <= self.max_bytes:
+            with self._lock:
+                if key in self._entries:
+                    self._remove(key)
+
+                self._entries[key] = (time.monotonic() + self.ttl, size, result)
+                self._bytes += size
+
+                while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                    self._remove(next(iter(self._entries)))
+                    self._stats['evictions'] += 1
+
+        return result
+
+    def stats(self) -> dict[str, float]:
+        """
+        Return the cache's metrics: the number of results kept and their approximate size in bytes, along with the
+        number of hits and misses, the fraction of queries that hit (hit_rate), and the number of results evicted
+        to stay within the bounds or dropped after expiring.
+        """
+        with self._lock:
+            queries = self._stats['hits'] + self._stats['misses']
+            return {'entries': len(self._entries), 'bytes': self._bytes, **self._stats,
+                    'hit_rate': self._stats['hits'] / queries if queries else 0.0}
+
+    def clear(self) -> None:
+        """
+        Remove every cached result.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key: str) -> None:
+        """
+        Remove the result with the given key. The caller must hold _lock.
+        """
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+def cache_key(query: Any, version: Hashable) -> str:
+    """
+    Return the hash identifying the given query against the given catalogue version. Equal queries always have the
+    same hash, whatever the order of the keys of their dictionaries.
+    """
+    text = json.dumps([query, version], sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def normalize_filters(filters: dict[str, Any]) -> dict[str, Any]:
+    """
+    Return the given user filters, as built by main.run_gui, with the selected genres and ratings sorted, so that
+    selecting the same filters in another order gives the same query.
+    """
+    return {'genre': sorted(filters['genre']), 'rating': sorted(filters['rating']), 'score': filters['score'],
+            'rel': list(filters['rel'])}
+
+
+def approximate_size(value: Any) -> int:
+    """
+    Return the approximate number of bytes of memory taken by the given value, including the items of lists,
+    tuples, sets and dictionaries.
+    """
+    size = sys.getsizeof(value)
+
+    if isinstance(value, dict):
+        size += sum(approximate_size(k) + approximate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(approximate_size(item) for item in value)
+
+    return size
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['__future__', 'collections', 'hashlib', 'json', 'sys', 'threading', 'time', 'typing'],
+        'max-line-length': 120
+    })
@@ -15,11 +15,40 @@ All forms of distribution of this code, whether as given or with any changes, ar
 """
 
 import re
-from typing import Optional, Any
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, Optional
 import bs4
 from bs4 import BeautifulSoup as bs
 import requests
+import pipeline
+import repository
 import sql_db
+from fetcher import Fetcher, HEADERS
+from http_cache import CachedResponse, HttpCache
+
+try:
+    import lxml  # pylint: disable=unused-import
+    LISTING_PARSER = 'lxml'
+except ImportError:
+    LISTING_PARSER = 'html.parser'
+
+# The url every movie's page is found under
+MOVIE_LINK = 'https://www.metacritic.com/movie/'
+
+# The file recording the last page written by scrape_data
+CHECKPOINT_FILE = 'scrape_checkpoint.json'
+
+# The image stored for movies whose card has no poster
+DEFAULT_IMG = 'https://i.ytimg.com/vi/g13gs5a8HZ4/hqdefault.jpg'
+
+# The number of listing pages in a row without new or changed movies after which recrawl stops
+UNCHANGED_PAGES = 3
+
+# The kind of data parsed from a movie's page by get_links, as stored in the HttpCache
+DETAILS = 'details'
+
+# Only the movie cards of a listing page are parsed, as nothing else on the page is used
+CARD_STRAINER = bs4.SoupStrainer(class_='c-finderProductCard')
 
 
 def format_movie(movie: str, movie_link: str) -> str:
@@ -40,15 +69,15 @@ def format_movie(movie: str, movie_link: str) -> str:
     return full_link
 
 
-def get_soup_item(link: str) -> requests.Response:
+def get_soup_item(link: str, fetcher: Optional[Fetcher] = None) -> requests.Response:
     """
-    Creates a request to load to the given link into a beautiful soup object.
+    Creates a request to load to the given link into a beautiful soup object. If a fetcher is given, the request is
+    sent through it.
     """
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (iPad; CPU OS 12_2 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) '
-                      'Mobile/15E148'
-    }
-    return requests.get(link, headers=headers)
+    if fetcher is not None:
+        return fetcher.get(link)
+
+    return requests.get(link, headers=HEADERS)
 
 
 def rel_date(soup: bs4.BeautifulSoup) -> list[int]:
@@ -101,8 +130,6 @@ def get_image(soup: bs4.BeautifulSoup) -> list[str]:
     lst_images = []
 
     image_elements = soup.find_all("img", {"class": "c-cmsImage-loaded"})
-    print(image_elements)
-
 
     for img_element in image_elements:
         img_tag = img_element.find('img')
@@ -174,6 +201,64 @@ def get_desc(soup: bs4.BeautifulSoup) -> list[str]:
     return descriptions
 
 
+def parse_listing(html: bytes | str, parser: str = LISTING_PARSER, strain: bool = True) -> list[dict[str, Any]]:
+    """
+    Returns one record per movie card of the given listing page, in page order. Each record maps 'title', 'image',
+    'release', 'rating', 'metacritic' and 'description' to the value read from that card, or None if the card does
+    not have it.
+
+    Every card is walked once, so the fields of a record always belong to the same movie. If strain is True, only the
+    card subtrees of the page are parsed.
+    """
+    soup = bs(html, parser, parse_only=CARD_STRAINER if strain else None)
+
+    return [parse_card(card) for card in soup.find_all(class_='c-finderProductCard')]
+
+
+def parse_card(card: bs4.Tag) -> dict[str, Any]:
+    """
+    Returns the record of the given movie card, as described in parse_listing.
+    """
+    title_element = card.find('div', class_='c-finderProductCard_title')
+    title = title_element.text.strip() if title_element else ''
+    title = title.split('. ')[1] if '. ' in title else title
+
+    img_tag = card.find('img', class_='c-cmsImage-loaded') or card.find('img')
+    image = img_tag['src'] if img_tag and 'src' in img_tag.attrs else DEFAULT_IMG
+
+    release, rating = None, None
+    meta_element = card.find('div', class_='c-finderProductCard_meta')
+    meta = meta_element.get_text(' ', strip=True) if meta_element else ''
+
+    if meta and 'Metascore' not in meta:
+        date_match = re.search(r'\w+\s\d{1,2},\s\d{4}', meta)
+        if date_match:
+            release = int(date_match.group(0).split(',')[1].lstrip())
+
+        rating = meta.split()[-1]
+        if rating.isdigit():
+            rating = 'Unrated'
+
+    score = None
+    score_element = card.find('div', class_='g-outer-spacing-top-auto')
+    score_text = score_element.text.strip().split('Metascore')[0].strip() if score_element else ''
+
+    try:
+        score = float(score_text) if score_text else None
+    except ValueError:
+        score = None
+
+    desc_element = card.find('div', class_='c-finderProductCard_description')
+    description = desc_element.text.strip()[:8000] if desc_element else ''
+
+    return {'title': title[:8000] if title else 'Problem',
+            'image': image,
+            'release': release,
+            'rating': rating,
+            'metacritic': score,
+            'description': description or None}
+
+
 def user_score(soup: bs4.BeautifulSoup) -> float:
     """
     Returns the audience score corresponding to the movie from the given webpage.
@@ -249,72 +334,239 @@ def get_genre(soup: bs4.BeautifulSoup) -> list[str]:
     return genres
 
 
-def get_links(titles: list[str]) -> dict[str, Any]:
+def parse_details(html: bytes) -> list[Any]:
+    """
+    Returns the audience score, directors, runtime and genres found on the given movie page, as returned by
+    user_score, director_name, get_runtime and get_genre.
+    """
+    soup = bs(html, 'html.parser')
+    return [user_score(soup), director_name(soup), get_runtime(soup), get_genre(soup)]
+
+
+def get_links(titles: list[str], fetcher: Optional[Fetcher] = None, movie_link: str = MOVIE_LINK,
+              executor: Optional[Executor] = None, chunk_size: int = pipeline.CHUNK_SIZE) -> dict[str, Any]:
     """
     Stores specific information for each individual movie page in a dictionary with different attributes
     separated into key-value pairs, given a list of movie titles.
+
+    The pages of all the movies are fetched concurrently through the given fetcher, or a new one caching pages in
+    the default HttpCache if none is given. Movies whose page could not be fetched, or was not served successfully,
+    get None for every value rather than the values of an empty page. If the fetcher has a cache, the values parsed
+    from each page are cached with it, so pages served from the cache are not parsed again.
+
+    If an executor is given, pages are parsed by its processes, chunk_size pages at a time.
     """
-    aud_score = []
-    director = []
-    time = []
-    genre_ = []
+    if fetcher is None:
+        with Fetcher(cache=HttpCache()) as own_fetcher:
+            return get_links(titles, own_fetcher, movie_link, executor, chunk_size)
+
+    urls = [format_movie(tl, movie_link) for tl in titles]
+    responses = fetcher.get_many(urls)
+    details = [response.parsed.get(DETAILS) if isinstance(response, CachedResponse) else None
+               for response in responses]
 
-    for tl in titles:
-        movie = format_movie(tl, 'https://www.metacritic.com/movie/')
-        new_soup = bs(get_soup_item(movie).content, 'html.parser')
-        aud_score.append(user_score(new_soup))
-        director.append(director_name(new_soup))
-        time.append(get_runtime(new_soup))
-        genre_.append(get_genre(new_soup))
+    unparsed = [i for i, values in enumerate(details)
+                if values is None and responses[i] is not None and responses[i].status_code == 200]
+    pages = [responses[i].content for i in unparsed]
+    parsed = executor.map(parse_details, pages, chunksize=chunk_size) if executor else map(parse_details, pages)
 
-    return {'aud_score': aud_score, 'director': director, 'time': time, 'genre_': genre_}
+    for i, values in zip(unparsed, parsed):
+        details[i] = values
 
+        if fetcher.cache is not None:
+            fetcher.cache.store_parsed(urls[i], DETAILS, values)
 
-def scrape_data(dest_file: str, base_link: str, start: Optional[int] = 1, end: Optional[int] = 669) -> None:
+    details = [values if values is not None else [None] * 4 for values in details]
+    return {'aud_score': [values[0] for values in details], 'director': [values[1] for values in details],
+            'time': [values[2] for values in details], 'genre_': [values[3] for values in details]}
+
+
+def fetch_pages(base_link: str, pages: Iterable[int], fetcher: Fetcher) -> Iterator[tuple[int, bytes]]:
     """
-    Scrapes data from the given website. Starts from the given start page, ending at the end page, extracting
-    data from each page. Utilizes get_links to extract detailed info for every specific movie. Stores the
-    extracted data in a dictionary, and uses pandas to store the data in a csv file.
+    Yields the page number and html of each of the given listing pages.
     """
+    for page in pages:
+        yield page, get_soup_item(base_link + str(page), fetcher).content
 
-    page_number = start
-    max_pages = end
 
-    data = []
+def parse_page(page: tuple[int, bytes]) -> tuple[int, list[dict[str, Any]]]:
+    """
+    Returns the page number and card records of the given pair (page number, html) of a listing page.
+    """
+    return page[0], parse_listing(page[1])
+
+
+def parse_pages(pages: Iterable[tuple[int, bytes]], executor: Optional[Executor] = None,
+                chunk_size: int = pipeline.CHUNK_SIZE) -> Iterator[tuple[int, list[dict[str, Any]]]]:
+    """
+    Yields the page number and card records of each of the given listing pages, as returned by parse_listing. If an
+    executor is given, pages are parsed by its processes, chunk_size pages at a time.
+    """
+    if executor is not None:
+        yield from pipeline.in_processes(parse_page, pages, executor, chunk_size)
+    else:
+        yield from map(parse_page, pages)
 
-    while page_number <= max_pages:
-        soup = bs(get_soup_item(base_link + str(page_number)).content, 'html.parser')
-        titles = get_title(soup)
-        movie_info = get_links(titles)
+
+def changed_cards(pages: Iterable[tuple[int, list[dict[str, Any]]]], known: dict[str, tuple],
+                  unchanged_pages: int = UNCHANGED_PAGES) -> Iterator[tuple[int, list[dict[str, Any]]]]:
+    """
+    Yields the page number and the card records of each of the given pages whose movie is new or changed, that is,
+    whose title is not in known or whose sql_db.card_fingerprint differs from the one known for it. Stops once
+    unchanged_pages pages in a row had no new or changed movie, closing the given pages.
+    """
+    unchanged = 0
+
+    try:
+        for page, cards in pages:
+            changed = [card for card in cards if known.get(card['title']) != sql_db.card_fingerprint(card)]
+            unchanged = 0 if changed else unchanged + 1
+            yield page, changed
+
+            if unchanged >= unchanged_pages:
+                print(f"No changes in the {unchanged} pages up to page {page}, stopping")
+                return
+    finally:
+        if hasattr(pages, 'close'):
+            pages.close()
+
+
+def fetch_details(pages: Iterable[tuple[int, list[dict[str, Any]]]], fetcher: Fetcher,
+                  movie_link: str = MOVIE_LINK, executor: Optional[Executor] = None,
+                  chunk_size: int = pipeline.CHUNK_SIZE) -> Iterator[tuple[int, list[dict[str, Any]]]]:
+    """
+    Yields the page number and complete rows of each of the given pages of card records, adding the details found on
+    each movie's page using get_links.
+
+    Movies whose page could not be fetched are left out, so that no blank row is written for them; since they are
+    not written, the next crawl or recrawl tries them again. How many were left out is printed with each page.
+    """
+    for page, cards in pages:
+        movie_info = get_links([card['title'] for card in cards], fetcher, movie_link, executor, chunk_size)
+        rows = []
+        skipped = 0
 
         # Combine data for each movie into a row dictionary
-        for i, title in enumerate(titles):
+        for i, card in enumerate(cards):
+            if movie_info['genre_'][i] is None:
+                skipped += 1
+                continue
+
             row = {
-                'title': title,
-                'image': get_image(soup)[i],
-                'release': rel_date(soup)[i] if i < len(rel_date(soup)) else None,
-                'rating': get_rating(soup)[i] if i < len(get_rating(soup)) else None,
-                'metacritic': get_score(soup)[i] if i < len(get_score(soup)) else None,
-                'description': get_desc(soup)[i] if i < len(get_desc(soup)) else None,
+                **card,
                 'audience': movie_info['aud_score'][i] if i < len(movie_info['aud_score']) else None,
                 'directors': movie_info['director'][i] if i < len(movie_info['director']) else None,
                 'runtime': movie_info['time'][i] if i < len(movie_info['time']) else None,
                 'genres': ', '.join(movie_info['genre_'][i]) if i < len(movie_info['genre_']) else None,
             }
-            data.append(row)
+            rows.append(row)
+
+        if skipped:
+            print(f"Scraped page {page}, skipped {skipped} movies whose page could not be fetched")
+        else:
+            print(f"Scraped page {page}")
+        yield page, rows
+
+
+def scrape_data(dest_file: str, base_link: str, start: Optional[int] = 1, end: Optional[int] = 669,
+                fetcher: Optional[Fetcher] = None, movie_link: str = MOVIE_LINK,
+                write: Optional[Callable[[list[dict[str, Any]]], Any]] = None,
+                checkpoint_file: Optional[str] = CHECKPOINT_FILE, flush_rows: int = pipeline.FLUSH_ROWS,
+                parse_workers: Optional[int] = None, parse_chunk: int = pipeline.CHUNK_SIZE) -> int:
+    """
+    Scrapes data from the given website. Starts from the given start page, ending at the end page, extracting
+    data from each page. Utilizes get_links to extract detailed info for every specific movie. Returns the number of
+    rows written.
+
+    Listing pages are fetched, parsed and completed with their movies' details by separate stages connected by
+    bounded queues, so only a few pages are held in memory at once. Rows are passed to write (by default, upserted
+    into the database by title) every flush_rows rows, after which the last page written is saved to
+    checkpoint_file. If checkpoint_file says pages of the same base_link before the end page were already written,
+    scraping resumes after the last one. The checkpoint is deleted once every page has been written, so the next run
+    starts from the start page again. Pass None as checkpoint_file to always start from the start page.
+
+    Only movies whose page was fetched are written (see fetch_details), so a failed request during a rescrape never
+    overwrites a movie that is already stored; the upsert also keeps the stored sql_db.DETAIL_COLUMNS of a row that
+    has no value for them.
+
+    All requests are sent through the given fetcher, or a new one caching pages in the default HttpCache if none is
+    given. How many pages were served from the cache is printed once done.
+
+    If parse_workers is given, listing and movie pages are parsed by a pool of that many processes, parse_chunk pages
+    at a time, instead of by the threads of the pipeline, which can only use one core between them.
+    """
+    if fetcher is None:
+        with Fetcher(cache=HttpCache()) as own_fetcher:
+            return scrape_data(dest_file, base_link, start, end, own_fetcher, movie_link, write, checkpoint_file,
+                               flush_rows, parse_workers, parse_chunk)
+
+    write = write if write is not None else repository.save_movies
+    checkpoint = pipeline.Checkpoint(checkpoint_file, base_link) if checkpoint_file is not None else None
+    last_page = checkpoint.last_page() if checkpoint is not None else None
+
+    # A checkpoint at or past the end page was left by a crawl that finished, so there is nothing to resume
+    if last_page is not None and start <= last_page < end:
+        print(f"Resuming after page {last_page}")
+        start = last_page + 1
+
+    stats = fetcher.stats.copy()
+    executor = ProcessPoolExecutor(parse_workers) if parse_workers else None
+
+    try:
+        pages = pipeline.threaded(fetch_pages(base_link, range(start, end + 1), fetcher))
+        cards = pipeline.threaded(parse_pages(pages, executor, parse_chunk))
+        rows = pipeline.threaded(fetch_details(cards, fetcher, movie_link, executor, parse_chunk))
+        written = pipeline.write_batches(rows, write, checkpoint, flush_rows)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    if checkpoint is not None:
+        checkpoint.clear()
+
+    print(f"Fetched {fetcher.stats.since(stats)}")
+    return written
+
+
+def recrawl(base_link: str, start: int = 1, end: int = 669, fetcher: Optional[Fetcher] = None,
+            movie_link: str = MOVIE_LINK, write: Optional[Callable[[list[dict[str, Any]]], Any]] = None,
+            known: Optional[dict[str, tuple]] = None, unchanged_pages: int = UNCHANGED_PAGES,
+            flush_rows: int = pipeline.FLUSH_ROWS) -> int:
+    """
+    Scrapes only the movies that are new or changed since they were last written, and returns the number of rows
+    written. The listing pages from start to end are fetched and parsed as in scrape_data, but a movie's page is
+    only fetched if its card differs from what known (by default, the fingerprints of the movies table, as returned
+    by repository.load_fingerprints) says about it.
+
+    Paging stops early once unchanged_pages pages in a row had no new or changed movie. This suits a base_link
+    listing movies newest first, where new movies and the recent movies whose scores still change come first.
+    A changed movie whose page could not be fetched is not written, so its fingerprint stays outdated and the next
+    recrawl tries it again.
+
+    All requests are sent through the given fetcher, or a new one whose HttpCache has a ttl of 0 if none is given,
+    so that every cached page is revalidated with the server rather than compared as it was when cached. A given
+    fetcher's cache should have a ttl of 0 for the same reason.
+    """
+    if fetcher is None:
+        with Fetcher(cache=HttpCache(ttl=0)) as own_fetcher:
+            return recrawl(base_link, start, end, own_fetcher, movie_link, write, known, unchanged_pages, flush_rows)
+
+    write = write if write is not None else repository.save_movies
+    known = known if known is not None else repository.load_fingerprints()
 
-        print(f"Scraped page {page_number}")
+    stats = fetcher.stats.copy()
+    cards = pipeline.threaded(parse_pages(pipeline.threaded(fetch_pages(base_link, range(start, end + 1), fetcher))))
+    rows = pipeline.threaded(fetch_details(changed_cards(cards, known, unchanged_pages), fetcher, movie_link))
 
-        page_number += 1
+    written = pipeline.write_batches(rows, write, None, flush_rows)
+    print(f"Fetched {fetcher.stats.since(stats)}")
 
-    sql_db.insert_data_into_table(data)
+    return written
 
 
 if __name__ == "__main__":
     # These are the base urls used for scraping
     BASE_LINK = 'https://www.metacritic.com/browse/movie/?releaseYearMin=1910&releaseYearMax=2024&page='
-    MOVIE_LINK = 'https://www.metacritic.com/movie/'
-    DEFAULT_IMG = 'https://i.ytimg.com/vi/g13gs5a8HZ4/hqdefault.jpg'
     scrape_data('movies_short.csv', BASE_LINK, 1, 2)
 
     # import python_ta
@@ -1,13 +1,60 @@
+import functools
+import hashlib
 import os
+import sqlite3
+import zlib
 
 import pyodbc
 from dotenv import load_dotenv
 
+# The columns of the movies table written by the scraper, in the order clean_row returns them
+MOVIE_COLUMNS = ('title', 'image', 'release', 'rating', 'metacritic', 'description', 'audience', 'directors',
+                 'runtime', 'genres')
 
-def connect_to_db():
+INSERT_QUERY = (f"INSERT INTO movies ({', '.join(MOVIE_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(MOVIE_COLUMNS))})")
+
+# The columns read from a movie's own page rather than its listing card. An update leaves them as they are when the
+# new row has no value for them, so a movie whose page could not be fetched keeps the details of the last crawl.
+DETAIL_COLUMNS = ('audience', 'directors', 'runtime', 'genres')
+
+UPDATE_QUERY = ("UPDATE movies SET "
+                + ', '.join(f'{c} = COALESCE(?, {c})' if c in DETAIL_COLUMNS else f'{c} = ?' for c in MOVIE_COLUMNS[1:])
+                + " WHERE title = ?")
+
+# The default number of rows sent to the database at once by bulk_load
+BATCH_SIZE = 1000
+
+# The number of titles looked up at once when upserting, keeping below SQL Server's limit of 2100 parameters
+LOOKUP_SIZE = 500
+
+# The tables of the app, as created in the SQLite stand-in database
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS movies (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT, image TEXT, release INTEGER, rating TEXT, metacritic REAL, description TEXT,
+    audience REAL, directors TEXT, runtime TEXT, genres TEXT
+);
+CREATE INDEX IF NOT EXISTS movies_title ON movies (title);
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT, email TEXT, password TEXT, liked_movies TEXT
+);
+CREATE INDEX IF NOT EXISTS users_username ON users (username);
+CREATE INDEX IF NOT EXISTS users_email ON users (email);
+CREATE TABLE IF NOT EXISTS user_favourites (
+    user_id INTEGER NOT NULL REFERENCES users (id),
+    movie_id INTEGER NOT NULL REFERENCES movies (id),
+    PRIMARY KEY (user_id, movie_id)
+);
+CREATE INDEX IF NOT EXISTS user_favourites_movie ON user_favourites (movie_id);
+"""
+
+
+@functools.lru_cache(maxsize=None)
+def connection_string():
     """
-    Connects to the Azure SQL Database using SQL Authentication.
-    Returns the connection object if successful.
+    Returns the connection string of the Azure SQL Database, built from the .env file the first time it is needed.
     """
     load_dotenv()
     server = os.getenv('server')
@@ -15,8 +62,7 @@ def connect_to_db():
     username = os.getenv('user')
     password = os.getenv('password')
 
-    # Build the connection string
-    connection_string = (
+    return (
         f'DRIVER={{ODBC Driver 18 for SQL Server}};'
         f'SERVER={server};'
         f'DATABASE={database};'
@@ -25,38 +71,209 @@ def connect_to_db():
         f'Authentication=SQLPassword;'
     )
 
+
+def connect_to_db():
+    """
+    Connects to the Azure SQL Database using SQL Authentication.
+    Returns the connection object if successful. The app checks connections out of the pool in repository instead
+    of calling this directly.
+    """
     try:
-        cnxn = pyodbc.connect(connection_string)
+        cnxn = pyodbc.connect(connection_string())
         print("Connection successful!")
         return cnxn
     except pyodbc.Error as e:
         print(f"Failed to connect to the database. Error: {e}")
         raise
 
-def insert_data_into_table(data):
-    cursor = connect_to_db().cursor()
+def connect_to_sqlite(path=':memory:'):
+    """
+    Connects to a SQLite database at the given path, creating the app's tables if they do not exist.
+    This stands in for the Azure SQL Database when testing offline.
+    """
+    cnxn = sqlite3.connect(path, check_same_thread=False)
+    cnxn.executescript(SQLITE_SCHEMA)
+    cnxn.create_function('BINARY_CHECKSUM', -1, binary_checksum, deterministic=True)
+    return cnxn
+
+
+def binary_checksum(*values):
+    """
+    Returns a signed 32-bit checksum of the given values. This stands in for SQL Server's BINARY_CHECKSUM in the
+    SQLite database, so that catalogue.VERSION_QUERY runs on both.
+    """
+    checksum = zlib.crc32('\x1f'.join('\x00' if v is None else repr(v) for v in values).encode('utf-8'))
+    return checksum - 2 ** 32 if checksum >= 2 ** 31 else checksum
+
+
+class LoadReport:
+    """
+    The outcome of a bulk load of movies.
+
+    Instance Attributes:
+        inserted:
+            The number of new movies added.
+        updated:
+            The number of existing movies, matched by title, whose columns were overwritten.
+        rejected:
+            The (title, reason) of every row that was not written.
+    """
+
+    inserted: int
+    updated: int
+    rejected: list[tuple[str, str]]
+
+    def __init__(self) -> None:
+        self.inserted = 0
+        self.updated = 0
+        self.rejected = []
+
+    def __str__(self) -> str:
+        return f'{self.inserted} inserted, {self.updated} updated, {len(self.rejected)} rejected'
+
+
+def clean_row(d):
+    """
+    Returns the values of the given scraped movie in the order of MOVIE_COLUMNS, converting numeric columns and
+    tidying the directors. Raises ValueError if the movie cannot be stored.
+    """
+    if not isinstance(d.get('title'), str) or not d['title'].strip():
+        raise ValueError('missing title')
+
+    directors = d.get('directors')
+    if directors is not None:
+        directors = directors.replace("\n", "").replace("\t", "").replace("\b", "").replace("  ", "").strip()
+
+    try:
+        release = int(d['release']) if d.get('release') is not None else None
+        metacritic = float(d['metacritic']) if d.get('metacritic') is not None else None
+        audience = float(d['audience']) if d.get('audience') is not None else None
+    except (TypeError, ValueError) as e:
+        raise ValueError(f'bad number: {e}') from e
+
+    return (d['title'], d.get('image'), release, d.get('rating'), metacritic, d.get('description'), audience,
+            directors, d.get('runtime'), d.get('genres'))
+
+
+def card_fingerprint(d):
+    """
+    Returns the values of the given scraped movie that the scraper compares to tell whether its listing card changed:
+    its metascore, its release year and a hash of its description.
+    """
+    metacritic = float(d['metacritic']) if d.get('metacritic') is not None else None
+    release = int(d['release']) if d.get('release') is not None else None
+    description = hashlib.sha1((d.get('description') or '').encode('utf-8')).hexdigest()
+
+    return metacritic, release, description
+
+
+def bulk_load(data, conn=None, batch_size=BATCH_SIZE, upsert=False):
+    """
+    Writes the given scraped movies to the movies table in batches of batch_size rows, each sent with a single
+    executemany call (using pyodbc's fast_executemany) and committed on its own. Returns a LoadReport.
+
+    If upsert is True, movies whose title is already in the table have their other columns updated instead of
+    being inserted again, except that DETAIL_COLUMNS the new row has no value for are kept. Within a batch, the last
+    row with a given title wins.
+
+    Rows that fail clean_row are rejected up front. If the database rejects a batch, its rows are retried one at a
+    time so that only the failing rows are rejected. A new connection is opened (and closed) if none is given.
+    """
+    if conn is None:
+        conn = connect_to_db()
+        try:
+            return bulk_load(data, conn, batch_size, upsert)
+        finally:
+            conn.close()
+
+    report = LoadReport()
+    rows = []
 
     for d in data:
         try:
-            query = (f"INSERT INTO movies (title, image, release, rating, metacritic, description, "
-                     f"audience, directors, runtime, genres) VALUES (?, ?, ?, ?,?,?,?,?,?,?)")
-            cursor.execute(query, (d['title'],
-                                   d['image'],
-                                   d['release'],
-                                   d['rating'],
-                                   d['metacritic'],
-                                   d['description'],
-                                   d['audience'],
-                                   d['directors'].replace("\n", "").replace("\t", "").replace("\b", "").replace("  ",
-                                                                                                                "").strip(),
-                                   d['runtime'],
-                                   d['genres']))
+            rows.append(clean_row(d))
+        except ValueError as e:
+            report.rejected.append((str(d.get('title')), str(e)))
+
+    cursor = conn.cursor()
+    if hasattr(cursor, 'fast_executemany'):
+        cursor.fast_executemany = True
+
+    try:
+        for i in range(0, len(rows), batch_size):
+            batch = rows[i:i + batch_size]
+
+            if upsert:
+                batch = list({row[0]: row for row in batch}.values())
+                existing = _existing_titles(cursor, [row[0] for row in batch])
+                updates = [row[1:] + row[:1] for row in batch if row[0] in existing]
+                inserts = [row for row in batch if row[0] not in existing]
+                report.updated += _write_batch(conn, cursor, UPDATE_QUERY, updates, report)
+            else:
+                inserts = batch
+
+            report.inserted += _write_batch(conn, cursor, INSERT_QUERY, inserts, report)
+
+    finally:
+        cursor.close()
+
+    return report
+
+
+def _existing_titles(cursor, titles):
+    """
+    Returns the set of the given titles that are already in the movies table.
+    """
+    existing = set()
+
+    for i in range(0, len(titles), LOOKUP_SIZE):
+        chunk = titles[i:i + LOOKUP_SIZE]
+        cursor.execute(f"SELECT title FROM movies WHERE title IN ({', '.join('?' * len(chunk))})", chunk)
+        existing.update(row[0] for row in cursor.fetchall())
+
+    return existing
+
+
+def _write_batch(conn, cursor, query, rows, report):
+    """
+    Runs query once for each of the given rows in a single executemany call, and commits. If it fails, the rows are
+    retried one at a time, and the failing ones are added to the report as rejected (the title is the first value of
+    an insert and the last of an update). Returns the number of rows written.
+    """
+    if not rows:
+        return 0
+
+    try:
+        cursor.executemany(query, rows)
+        conn.commit()
+        return len(rows)
+
+    except Exception:
+        conn.rollback()
+
+    written = 0
+    for row in rows:
+        try:
+            cursor.execute(query, row)
+            conn.commit()
+            written += 1
 
         except Exception as e:
-            print("Insert data into table: " + e)
-            print(d['title'])
+            conn.rollback()
+            report.rejected.append((row[0] if query == INSERT_QUERY else row[-1], str(e)))
+
+    return written
+
+
+def insert_data_into_table(data):
+    """
+    Inserts the given scraped movies into the movies table, returning a LoadReport.
+    """
+    report = bulk_load(data)
+    for title, reason in report.rejected:
+        print(f"Insert data into table: {title}: {reason}")
 
-    cursor.commit()
+    return report
 
 
 # Test the connection
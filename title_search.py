@@ -0,0 +1,162 @@
+"""
+CSC111 Project 2: Nxt Movie
+
+Module Description
+==================
+Fuzzy and prefix search over movie titles. Every title is indexed by the character bigrams and trigrams it contains,
+so a query only rescores the titles sharing the most of them rather than every title in the catalogue.
+
+Titles are scored with the partial ratio algorithm from rapidfuzz, falling back to fuzzywuzzy when rapidfuzz is not
+installed.
+
+Copyright and Usage Information
+===============================
+
+The file is expressly provided for the purposes of course assessments for CSC111 at the University of Toronto.
+All forms of distribution of this code, whether as given or with any changes, are expressly prohibited.
+
+© 2024 Umair Arham, Abdallah Arham Wajid Mohammed, Sameer Shahed, All Rights Reserved
+"""
+
+from __future__ import annotations
+import bisect
+import numpy as np
+
+try:
+    from rapidfuzz import fuzz, process
+    from rapidfuzz.utils import default_process as preprocess
+except ImportError:
+    from fuzzywuzzy import fuzz
+    from fuzzywuzzy.utils import full_process as preprocess
+    process = None
+
+# The number of titles sharing the most n-grams with a query that are rescored
+SHORTLIST = 2000
+
+
+class TitleSearch:
+    """
+    A search index over a list of movie titles, supporting fuzzy and prefix queries.
+
+    Fuzzy queries are answered in two steps. First, titles are ranked by the fraction of the trigrams of the shorter
+    of the title and the query that they share, which is cheap to compute from the index. Then, the best ranked
+    titles are rescored with the partial ratio algorithm. Queries sharing trigrams with too few titles use bigrams.
+
+    Instance Attributes:
+        titles:
+            The indexed titles. Results are returned in the order of this list when their scores are equal.
+    """
+    # Private Instance Attributes:
+    #   - _processed:
+    #       The titles lowercased and stripped of punctuation, as compared against queries.
+    #   - _postings:
+    #       A mapping from each bigram and trigram to the increasing array of the positions of the titles
+    #       containing it.
+    #   - _gram_counts:
+    #       A mapping from n (2 or 3) to the number of distinct n-grams in each processed title.
+    #   - _sorted:
+    #       The pairs (processed title, position) in increasing order, used for prefix queries.
+
+    titles: list[str]
+    _processed: list[str]
+    _postings: dict[str, np.ndarray]
+    _gram_counts: dict[int, np.ndarray]
+    _sorted: list[tuple[str, int]]
+
+    def __init__(self, titles: list[str]) -> None:
+        """Initialize a new TitleSearch over the given titles."""
+        self.titles = list(titles)
+        self._processed = [preprocess(title) for title in self.titles]
+        self._gram_counts = {n: np.zeros(len(self.titles), dtype=np.int32) for n in (2, 3)}
+
+        postings = {}
+        for i, title in enumerate(self._processed):
+            for n in (2, 3):
+                grams = ngrams(title, n)
+                self._gram_counts[n][i] = len(grams)
+                for gram in grams:
+                    postings.setdefault(gram, []).append(i)
+
+        self._postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self._sorted = sorted((title, i) for i, title in enumerate(self._processed))
+
+    def search(self, query: str, limit: int = 25, shortlist: int = SHORTLIST) -> list[str]:
+        """
+        Return the (at most) limit titles with the highest partial ratio to the given query, best first.
+
+        Only the shortlist titles sharing the largest fraction of n-grams with the query are scored. If fewer than
+        limit titles share a single bigram with the query, every title is scored instead.
+        """
+        query = preprocess(query)
+        candidates = self._candidates(query, limit, shortlist)
+        scores = partial_ratios(query, [self._processed[i] for i in candidates])
+        best = np.lexsort((candidates, -scores))[:limit]
+
+        return [self.titles[candidates[i]] for i in best]
+
+    def complete(self, prefix: str, limit: int = 10) -> list[str]:
+        """
+        Return the (at most) limit titles starting with the given prefix, ignoring case and punctuation, in
+        alphabetical order.
+        """
+        prefix = preprocess(prefix)
+        start = bisect.bisect_left(self._sorted, (prefix, -1))
+        matches = []
+
+        for title, i in self._sorted[start:start + limit]:
+            if not title.startswith(prefix):
+                break
+            matches.append(self.titles[i])
+
+        return matches
+
+    def _candidates(self, query: str, limit: int, shortlist: int) -> np.ndarray:
+        """
+        Return the increasing positions of the titles worth scoring against the given processed query.
+        """
+        for n in (3, 2):
+            grams = ngrams(query, n)
+            hits = [self._postings[gram] for gram in grams if gram in self._postings]
+            if not hits:
+                continue
+
+            shared = np.bincount(np.concatenate(hits), minlength=len(self.titles))
+            matched = np.flatnonzero(shared)
+            if len(matched) < limit:
+                continue
+
+            if len(matched) > shortlist:
+                fraction = shared[matched] / np.maximum(np.minimum(self._gram_counts[n][matched], len(grams)), 1)
+                matched = np.sort(matched[np.argpartition(-fraction, shortlist - 1)[:shortlist]])
+
+            return matched
+
+        return np.arange(len(self.titles))
+
+
+def partial_ratios(query: str, choices: list[str]) -> np.ndarray:
+    """
+    Return the partial ratio between the given query and each of the given choices, scoring them all in a single
+    call when rapidfuzz is installed.
+    """
+    if process is not None:
+        return process.cdist([query], choices, scorer=fuzz.partial_ratio, dtype=np.float64)[0]
+
+    return np.array([fuzz.partial_ratio(query, choice) for choice in choices], dtype=np.float64)
+
+
+def ngrams(text: str, n: int) -> set[str]:
+    """
+    Return the set of all substrings of length n of the given text.
+    """
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['__future__', 'bisect', 'numpy', 'rapidfuzz', 'rapidfuzz.utils', 'fuzzywuzzy',
+                          'fuzzywuzzy.utils'],
+        'max-line-length': 120
+    })
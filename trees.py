@@ -16,9 +16,10 @@ All forms of distribution of this code, whether as given or with any changes, ar
 
 from __future__ import annotations
 import ast
-from typing import Optional, Any
+from typing import Iterator, Optional, Any
+import numpy as np
 import pandas as pd
-from fuzzywuzzy import fuzz, process
+from title_search import TitleSearch
 
 
 class Movie:
@@ -94,6 +95,189 @@ class Movie:
         return [d.strip() for d in dirc.replace('\n', '').split(',')]
 
 
+class MovieStore:
+    """
+    The attributes of many movies stored column by column in numpy arrays, rather than as one object per movie.
+    Repeated strings are stored once: ratings are codes into a table of ratings, and the genres and directors of a
+    movie are a slice of ids into a shared table of genres or directors.
+
+    Indexing or iterating over a MovieStore gives MovieView objects, which have the same attributes as Movie.
+
+    Instance Attributes:
+        names:
+            The name of each movie.
+        images:
+            The url of each movie's poster/image.
+        years:
+            The year each movie was released, or 0 if it is unknown.
+        rating_codes:
+            The position of each movie's pg-rating in rating_table, or -1 if it is unknown.
+        rating_table:
+            Every distinct pg-rating.
+        scores:
+            The average of the metacritic and audience score of each movie.
+        descriptions:
+            The description of each movie's plot.
+        runtimes:
+            The total play time of each movie.
+        genre_ids:
+            The positions in genre_table of the genres of every movie, one movie after the other.
+        genre_offsets:
+            The genres of movie i are genre_ids[genre_offsets[i]:genre_offsets[i + 1]].
+        genre_table:
+            Every distinct genre.
+        director_ids:
+            The positions in director_table of the directors of every movie, one movie after the other.
+        director_offsets:
+            The directors of movie i are director_ids[director_offsets[i]:director_offsets[i + 1]].
+        director_table:
+            Every distinct director.
+
+    Representation Invariants:
+        - all(len(column) == len(self.names) for column in [self.images, self.years, self.rating_codes, self.scores,
+          self.descriptions, self.runtimes])
+        - len(self.genre_offsets) == len(self.director_offsets) == len(self.names) + 1
+    """
+    # Private Instance Attributes:
+    #   - _views:
+    #       The MovieView of each movie, so that the same object is returned every time a movie is accessed.
+
+    names: np.ndarray
+    images: np.ndarray
+    years: np.ndarray
+    rating_codes: np.ndarray
+    rating_table: list[str]
+    scores: np.ndarray
+    descriptions: np.ndarray
+    runtimes: np.ndarray
+    genre_ids: np.ndarray
+    genre_offsets: np.ndarray
+    genre_table: list[str]
+    director_ids: np.ndarray
+    director_offsets: np.ndarray
+    director_table: list[str]
+    _views: list[MovieView]
+
+    def __init__(self, df: pd.DataFrame) -> None:
+        """Initialize a new MovieStore holding every movie in the given pandas dataframe, one movie per row."""
+        self.names = df['title'].to_numpy(dtype=object)
+        self.images = df['image'].to_numpy(dtype=object)
+        self.years = df['release'].fillna(0).to_numpy().astype(np.int16)
+        codes, table = pd.factorize(df['rating'])
+        self.rating_codes = codes.astype(np.int16)
+        self.rating_table = list(table)
+        self.scores = ((df['metacritic'] + df['audience'] * 10) / 2).to_numpy(dtype=np.float32)
+        self.descriptions = df['description'].to_numpy(dtype=object)
+        self.runtimes = df['runtime'].to_numpy(dtype=object)
+
+        # Split the same way as Movie.format_genre and Movie.format_director
+        genres = df['genres'].fillna('').str.split(',')
+        self.genre_ids, self.genre_offsets, self.genre_table = _shared_table(genres)
+        directors = df['directors'].map(str).str.replace('\n', '', regex=False).str.split(',')
+        self.director_ids, self.director_offsets, self.director_table = _shared_table(directors, strip=True)
+
+        self._views = [MovieView(self, i) for i in range(len(self.names))]
+
+    def __len__(self) -> int:
+        """Return the number of movies in this store."""
+        return len(self._views)
+
+    def __getitem__(self, i: int) -> MovieView:
+        """Return the movie at position i of this store."""
+        return self._views[i]
+
+    def __iter__(self) -> Iterator[MovieView]:
+        """Return an iterator over the movies of this store, in order."""
+        return iter(self._views)
+
+
+def _shared_table(lists: pd.Series, strip: bool = False) -> tuple[np.ndarray, np.ndarray, list[str]]:
+    """
+    Store a column of lists of strings as the ids of its strings in a table of distinct strings, along with the
+    offsets at which each list starts, as described in MovieStore. Return the ids, offsets and table.
+    """
+    exploded = lists.explode()
+    if strip:
+        exploded = exploded.str.strip()
+
+    ids, table = pd.factorize(exploded)
+    offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+    np.cumsum(lists.str.len().to_numpy(), out=offsets[1:])
+
+    return ids.astype(np.int32), offsets, list(table)
+
+
+class MovieView:
+    """
+    A movie stored in a MovieStore, with the same attributes as Movie. The attributes are read from the store when
+    they are accessed, so a MovieView takes up very little memory.
+    """
+    # Private Instance Attributes:
+    #   - _store:
+    #       The MovieStore holding this movie.
+    #   - _row:
+    #       The position of this movie in _store.
+
+    __slots__ = ('_store', '_row')
+    _store: MovieStore
+    _row: int
+
+    def __init__(self, store: MovieStore, row: int) -> None:
+        """Initialize a new view of the movie at the given row of store."""
+        self._store = store
+        self._row = row
+
+    @property
+    def name(self) -> str:
+        """The name of the movie."""
+        return self._store.names[self._row]
+
+    @property
+    def image(self) -> str:
+        """The url of the movie's poster/image."""
+        return self._store.images[self._row]
+
+    @property
+    def rel(self) -> int:
+        """The year the movie was released."""
+        return int(self._store.years[self._row])
+
+    @property
+    def rating(self) -> Optional[str]:
+        """The pg-rating of the movie."""
+        code = self._store.rating_codes[self._row]
+        return self._store.rating_table[code] if code >= 0 else None
+
+    @property
+    def score(self) -> float:
+        """The average score of the movie (averaged between metacritic and audience scores)."""
+        return float(self._store.scores[self._row])
+
+    @property
+    def desc(self) -> str:
+        """The description of the movie's plot."""
+        return self._store.descriptions[self._row]
+
+    @property
+    def dirc(self) -> list[str]:
+        """The people who directed the movie."""
+        store = self._store
+        ids = store.director_ids[store.director_offsets[self._row]:store.director_offsets[self._row + 1]]
+        return [store.director_table[i] for i in ids]
+
+    @property
+    def run(self) -> str:
+        """The total play time of the movie."""
+        return self._store.runtimes[self._row]
+
+    @property
+    def genre(self) -> list[str]:
+        """The genre categories the movie falls into."""
+        store = self._store
+        ids = store.genre_ids[store.genre_offsets[self._row]:store.genre_offsets[self._row + 1]]
+        return [store.genre_table[i] for i in ids]
+
+
 class Tree:
     """
     A recursive tree data structure.
@@ -188,23 +372,104 @@ class Tree:
         return matching
 
 
-def read_in_movies(df: pd.DataFrame) -> list[Movie]:
+class FilterIndex:
     """
-    Read in movie data from the given pandas dataframe and store each row as a Movie object in a list.
-    Preconditions:
-        - df is not None
+    An index of movies by the attributes the user can filter on, answering the same queries as Tree.matching.
+
+    For every score band, pg-rating and genre, the index stores a boolean mask marking the movies that have it, and
+    release years are stored sorted so that a range of years is a single slice. A query is answered by combining
+    these masks, without visiting any movie that does not match.
     """
-    movies = []
+    # Private Instance Attributes:
+    #   - _names:
+    #       The names of the indexed movies, with duplicate names removed.
+    #   - _bands:
+    #       A mapping from each score band ('HIGH' or 'LOW') to the mask of movies in that band.
+    #   - _ratings:
+    #       A mapping from each pg-rating to the mask of movies with that rating.
+    #   - _genres:
+    #       A mapping from each genre to the mask of movies with that genre.
+    #   - _years:
+    #       The release years of the movies, in increasing order.
+    #   - _year_order:
+    #       The movies in increasing order of release year, so that _years[i] is the release year of movie
+    #       _year_order[i].
+
+    _names: list[str]
+    _bands: dict[str, np.ndarray]
+    _ratings: dict[str, np.ndarray]
+    _genres: dict[str, np.ndarray]
+    _years: np.ndarray
+    _year_order: np.ndarray
+
+    def __init__(self, all_movies: list[Movie]) -> None:
+        """Initialize a new FilterIndex of the given movies."""
+        by_name = {}
+        for movie in all_movies:
+            by_name.setdefault(movie.name, movie)
+        movies = list(by_name.values())
+        n = len(movies)
+
+        self._names = [movie.name for movie in movies]
+        self._bands, self._ratings, self._genres = {}, {}, {}
+
+        for i, movie in enumerate(movies):
+            self._bands.setdefault(score_band(movie), np.zeros(n, dtype=bool))[i] = True
+            self._ratings.setdefault(movie.rating, np.zeros(n, dtype=bool))[i] = True
+            for gen in movie.genre:
+                self._genres.setdefault(gen, np.zeros(n, dtype=bool))[i] = True
+
+        years = np.array([np.nan if movie.rel is None else movie.rel for movie in movies], dtype=np.float64)
+        self._year_order = np.argsort(years, kind='stable')
+        self._years = years[self._year_order]
+
+    def matching(self, user_input: dict) -> list[str]:
+        """
+        Return the names of the movies that match the user's desired filters, in the format taken by Tree.matching.
+        Like Tree.matching, release years are matched from user_input['rel'][0] up to but not including
+        user_input['rel'][1].
 
-    for _, row in df.iterrows():
+        Preconditions:
+            - user_input is not None
+        """
+        n = len(self._names)
+
+        if user_input['score'] == 'BOTH':
+            mask = np.ones(n, dtype=bool)
+        else:
+            mask = self._bands.get(user_input['score'], np.zeros(n, dtype=bool)).copy()
 
-        mov = Movie(name=row['title'], image=row['image'], rel=row['release'], rating=row['rating'],
-                    meta=row['metacritic'],
-                    desc=row['description'], aud=row['audience'], dirc=str(row['directors']), run=row['runtime'],
-                    genre=  row['genres'])
-        movies.append(mov)
+        mask &= self._any_of(self._ratings, user_input['rating'])
+        mask &= self._any_of(self._genres, user_input['genre'])
 
-    return movies
+        start, end = np.searchsorted(self._years, user_input['rel'], side='left')
+        released = np.zeros(n, dtype=bool)
+        released[self._year_order[start:end]] = True
+        mask &= released
+
+        return [self._names[i] for i in np.flatnonzero(mask)]
+
+    def _any_of(self, masks: dict[str, np.ndarray], values: list[str]) -> np.ndarray:
+        """
+        Return the mask of movies having at least one of the given values, according to masks.
+        """
+        result = np.zeros(len(self._names), dtype=bool)
+
+        for value in values:
+            if value in masks:
+                result |= masks[value]
+
+        return result
+
+
+def read_in_movies(df: pd.DataFrame) -> list[MovieView]:
+    """
+    Read in movie data from the given pandas dataframe into a MovieStore, and return a list of the movie of each row.
+    The movies have the same attributes as Movie objects.
+    Preconditions:
+        - df is not None
+    """
+    return list(MovieStore(df))
 
 
 def build_tree(all_movies: list[Movie]) -> Tree:
@@ -216,18 +481,22 @@ def build_tree(all_movies: list[Movie]) -> Tree:
     for movie in all_movies:
         for gen in movie.genre:
             date = movie.rel
-
-            if movie.score < 70:  # Following metacritic's convention, scores >= 70 are considered 'good'
-                score = 'LOW'
-            else:
-                score = 'HIGH'
-
-            lst = [score, movie.rating, date, gen, movie.name]
+            lst = [score_band(movie), movie.rating, date, gen, movie.name]
             tree.insert_sequence(lst)
 
     return tree
 
 
+def score_band(movie: Movie) -> str:
+    """
+    Return 'HIGH' if the given movie has a good score, and 'LOW' otherwise.
+    """
+    if movie.score < 70:  # Following metacritic's convention, scores >= 70 are considered 'good'
+        return 'LOW'
+    else:
+        return 'HIGH'
+
+
 def get_all_filters(all_movies: list[Movie]) -> dict[str, Any]:
     """
     Return a dictionary containing all available filters for movies in a list of movie objects.
@@ -248,49 +517,104 @@ def get_all_filters(all_movies: list[Movie]) -> dict[str, Any]:
             'score': 'HIGH', 'rel': date}
 
 
-def search(movie_name: str, movies: list[Movie], exact: bool = True) -> list[str] | Movie | None:
+class TitleIndex:
     """
-    Search for a list of movie that are similar to the input movie from a list of movie objects. There are 2
-    algorithms to choose from, and both algorithms output similar movies based on their titles only.
+    An index of movies by their name, built once so that movies can be looked up by name in constant time.
+    Iterating over a TitleIndex gives its movies in their original order, so it can be used in place of the list of
+    movies it was built from.
 
-    If exact is True, then the function will use the fuzzy module's partial ratio algorithm. Returns a list of matching
-    movie names.
-    If exact is False, then the function will perform a binary search and look for the exact movie. Returns a movie
-    object. If it cannot find an exact movie, it returns None.
+    Instance Attributes:
+        movies:
+            The indexed movies, in their original order.
+        titles:
+            The names of all the movies, sorted alphabetically.
+        by_title:
+            A mapping from each movie name to its Movie object. If several movies have the same name, the first one is
+            used.
     """
+    # Private Instance Attributes:
+    #   - _search:
+    #       The TitleSearch over titles, or None if no fuzzy search has been made yet.
 
-    movies = sorted(list(movies), key=lambda x: x.name)
-    b, e = 0, len(movies)
+    movies: list[Movie]
+    titles: list[str]
+    by_title: dict[str, Movie]
+    _search: Optional[TitleSearch]
 
-    if not exact:
-        matches = process.extract(movie_name, [mv.name for mv in movies], scorer=fuzz.partial_ratio, limit=25)
-        return [t[0] for t in matches]
+    def __init__(self, all_movies: list[Movie]) -> None:
+        """Initialize a new TitleIndex of the given movies."""
+        self.movies = list(all_movies)
+        self.titles = sorted(movie.name for movie in self.movies)
+        self.by_title = {}
 
-    while b < e:
-        m = (b + e) // 2
+        for movie in self.movies:
+            self.by_title.setdefault(movie.name, movie)
 
-        if movies[m].name == movie_name:
-            return movies[m]
+        self._search = None
 
-        elif movies[m].name > movie_name:
-            e = m
+    def __iter__(self) -> Iterator[Movie]:
+        """Return an iterator over the indexed movies."""
+        return iter(self.movies)
 
-        else:
-            b = m + 1
+    def __len__(self) -> int:
+        """Return the number of indexed movies."""
+        return len(self.movies)
+
+    def get(self, movie_name: str) -> Optional[Movie]:
+        """
+        Return the movie with the given name, or None if there is no such movie.
+        """
+        return self.by_title.get(movie_name)
+
+    @property
+    def fuzzy(self) -> TitleSearch:
+        """
+        The TitleSearch over the titles of the indexed movies, built the first time it is needed.
+        """
+        if self._search is None:
+            self._search = TitleSearch(self.titles)
+
+        return self._search
+
+
+def title_index(movies: list[Movie] | TitleIndex) -> TitleIndex:
+    """
+    Return the given movies as a TitleIndex, building one only if they are not already indexed.
+    """
+    return movies if isinstance(movies, TitleIndex) else TitleIndex(movies)
+
+
+def search(movie_name: str, movies: list[Movie] | TitleIndex, exact: bool = True) -> list[str] | Movie | None:
+    """
+    Search for a list of movie that are similar to the input movie from a list of movie objects. There are 2
+    algorithms to choose from, and both algorithms output similar movies based on their titles only.
+
+    If exact is False, then the function will use the partial ratio algorithm on the titles sharing the most trigrams
+    with the given name, as implemented by title_search.TitleSearch. Returns a list of matching movie names.
+    If exact is True, then the function will look up the exact movie in the title index. Returns a movie
+    object. If it cannot find an exact movie, it returns None.
+
+    Passing a TitleIndex instead of a list avoids indexing the movies again on every call.
+    """
+    index = title_index(movies)
+
+    if not exact:
+        return index.fuzzy.search(movie_name, 25)
 
-    return None
+    return index.get(movie_name)
 
 
-def convert_to_movie_obj(movie_names: list[str], all_movies: list[Movie]) -> list[Movie]:
+def convert_to_movie_obj(movie_names: list[str], all_movies: list[Movie] | TitleIndex) -> list[Movie]:
     """
     Given a list of strings, convert them to movie objects by finding them in the given list of all possible movie
-    objects using binary search.
+    objects using its title index.
     """
+    index = title_index(all_movies)
     found_names = set()
     lst = []
 
     for movie in movie_names:
-        movie_obj = search(movie, all_movies)
+        movie_obj = index.get(movie)
         if movie_obj and (movie_obj.name not in found_names):
             lst.append(movie_obj)
             found_names.add(movie_obj.name)
@@ -313,6 +637,6 @@ if __name__ == '__main__':
     import python_ta
 
     python_ta.check_all(config={
-        'extra-imports': ['__future__', 'ast', 'typing', 'pandas', 'fuzzywuzzy'],
+        'extra-imports': ['__future__', 'ast', 'typing', 'numpy', 'pandas', 'title_search'],
         'max-line-length': 120
     })
@@ -0,0 +1,17 @@
+-- The normalized favourites table, replacing the liked_movies column of users.
+-- After creating it, copy the existing favourites over with: python -c "import repository; repository.migrate_liked_movies()"
+
+CREATE TABLE user_favourites (
+    user_id INT NOT NULL REFERENCES users (id),
+    movie_id INT NOT NULL REFERENCES movies (id),
+    CONSTRAINT pk_user_favourites PRIMARY KEY (user_id, movie_id)
+);
+
+CREATE INDEX ix_user_favourites_movie ON user_favourites (movie_id);
+
+CREATE INDEX ix_users_username ON users (username);
+
+-- Favourites are added and removed by movie title, as are upserted movies, so titles are indexed too.
+-- An NVARCHAR(MAX) column cannot be indexed: if title is one, narrow it first with
+-- ALTER TABLE movies ALTER COLUMN title NVARCHAR(450);
+CREATE INDEX ix_movies_title ON movies (title);